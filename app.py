@@ -1,11 +1,14 @@
 import streamlit as st
 import requests
+import json
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 API_URL = os.getenv("MODAL_API_URL", "") 
+# Optional SSE endpoint (Modal label "query-stream"); when set, answers are streamed.
+STREAM_URL = os.getenv("MODAL_STREAM_URL", "")
 
 st.set_page_config(
     page_title="HukumOnline RAG Assistant",
@@ -55,9 +58,64 @@ st.markdown("""
 st.title("⚖️ Asisten Hukum Online")
 st.caption("Powered by Query Reformulation & RAG")
 
-if not API_URL:
+if not API_URL and not STREAM_URL:
     st.warning("⚠️ MODAL_API_URL is not set. Please deploy the backend and set the URL in .env")
 
+def render_references(refs):
+    if refs:
+        st.markdown("### 📚 Referensi")
+        for ref in refs:
+            title = ref.get('title', 'No Title')
+            url = ref.get('url', '#')
+            date = ref.get('publish_date', '')[:10]
+            st.markdown(f"- **[{title}]({url})** \n  *{date}* | `{ref.get('theme', 'General')}`")
+
+def iter_sse(response):
+    """Yields the JSON payload of each server-sent event."""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield json.loads(line[len("data:"):].strip())
+
+def stream_answer(prompt):
+    """Renders a streamed answer as tokens arrive and returns the chat message to store."""
+    answer_box = st.empty()
+    answer_box.markdown("_Sedang mencari referensi..._")
+    answer_text = ""
+    refs = []
+    exec_time = 0
+    ttft = None
+    with requests.post(STREAM_URL, json={"query": prompt}, stream=True, timeout=(10, 120)) as response:
+        if response.status_code != 200:
+            st.error(f"Error API: {response.status_code} - {response.text}")
+            return None
+        for event in iter_sse(response):
+            if event["type"] == "meta":
+                refs = event.get("references") or []
+                answer_box.empty()
+                with st.expander("🔍 Analisis Query (Reformulasi)"):
+                    st.markdown(f"**Query Asli:** {event.get('original_query', prompt)}")
+                    st.markdown(f"**Query Hukum:** {event.get('reformulated_query', 'N/A')}")
+                answer_box = st.empty()
+                answer_box.markdown("_Menyusun jawaban..._")
+            elif event["type"] == "token":
+                answer_text += event["text"]
+                answer_box.markdown(answer_text + "▌")
+            elif event["type"] == "done":
+                exec_time = event.get("execution_time", 0)
+                ttft = event.get("ttft")
+            elif event["type"] == "error":
+                st.error(f"Error API: {event.get('detail')}")
+                return None
+    answer_box.markdown(answer_text or "Maaf, tidak dapat menghasilkan jawaban.")
+    st.caption(f"⏱️ Waktu pemrosesan: {exec_time} detik" + (f" | token pertama: {ttft} detik" if ttft else ""))
+    render_references(refs)
+    return {
+        "role": "assistant",
+        "content": answer_text,
+        "references": refs,
+        "execution_time": exec_time
+    }
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -80,10 +138,21 @@ if prompt := st.chat_input("Apa pertanyaan hukum Anda?"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        if not API_URL:
+        if not API_URL and not STREAM_URL:
             st.error("Cannot process query: API URL missing.")
             st.stop()
             
+        if STREAM_URL:
+            try:
+                message = stream_answer(prompt)
+                if message:
+                    st.session_state.messages.append(message)
+            except requests.exceptions.ConnectionError:
+                st.error("Gagal terhubung ke Server API. Pastikan API backend berjalan.")
+            except Exception as e:
+                st.error(f"Terjadi kesalahan tak terduga: {e}")
+            st.stop()
+
         try:
             with st.spinner("Sedang menghubungi ahli hukum digital..."):
                 response = requests.post(f"{API_URL}", json={"query": prompt}, timeout=120)
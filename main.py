@@ -1,20 +1,27 @@
-import os
 import sys
-from src import ingestion, rag_engine, config
+from src import config, utils
 
 def main():
+    utils.setup_logging()
     print("=== Legal RAG System (Double-Hop) ===")
     
-    if not config.GOOGLE_API_KEY:
+    # Needed for Google embeddings and the Gemini LLM; a local embedding provider with Groq runs without it.
+    if not config.GOOGLE_API_KEY and (config.EMBEDDING_PROVIDER == "google" or config.LLM_PROVIDER != "groq"):
         print("ERROR: GOOGLE_API_KEY not found.")
         print("Please create a .env file with GOOGLE_API_KEY=your_key_here")
         return
 
+    # Deferred until the keys are known to be there; these pull in LangChain and FAISS.
+    from src import rag_engine
+    from src.vector_store import index_exists
+
     force_reindex = "--reindex" in sys.argv
-    if force_reindex or not os.path.exists(config.INDEX_PATH):
-        print("Building index from data folder...")
+    incremental = "--update" in sys.argv and not force_reindex
+    if force_reindex or incremental or not index_exists():
+        print("Updating index from data folder..." if incremental else "Building index from data folder...")
         try:
-            ingestion.build_index()
+            from src import ingestion
+            ingestion.build_index(incremental=incremental)
         except Exception as e:
             print(f"Error building index: {e}")
             return
@@ -22,6 +29,8 @@ def main():
     print("Initializing RAG Engine...")
     try:
         engine = rag_engine.RAGEngine()
+        # Loads the LLM client, embeddings, index and reranker in parallel rather than on the first question.
+        engine.warmup()
     except Exception as e:
         print(f"Failed to initialize engine: {e}")
         return
@@ -37,11 +46,16 @@ def main():
             if not user_query.strip():
                 continue
                 
-            results = engine.process_query(user_query)
-            
-            print("\n=== FINAL ANSWER ===")
-            print(results["answer"])
-            print(f"\n[Duration: {results['execution_time']}s]")
+            print_header = True
+            for event in engine.stream_query(user_query):
+                if event["type"] == "token":
+                    if print_header:
+                        print("\n=== FINAL ANSWER ===")
+                        print_header = False
+                    print(event["text"], end="", flush=True)
+                elif event["type"] == "done":
+                    cached = " (cached)" if event.get("cached") else ""
+                    print(f"\n\n[Duration: {event['execution_time']}s, first token after {event['ttft']}s{cached}]")
             print("====================")
             
         except KeyboardInterrupt:
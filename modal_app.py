@@ -2,6 +2,7 @@ import modal
 from pydantic import BaseModel
 from typing import List, Optional
 import os
+import json
 
 rag_image = (
     modal.Image.debian_slim(python_version="3.10")
@@ -25,6 +26,10 @@ app = modal.App("hukumonline-rag")
 
 class QueryRequest(BaseModel):
     query: str
+    theme: Optional[str] = None
+    tags: Optional[List[str]] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
 
 class Reference(BaseModel):
     title: str
@@ -37,6 +42,8 @@ class QueryResponse(BaseModel):
     reformulated_query: str
     answer: str
     references: List[Reference]
+    cached: bool = False
+    trace: Optional[dict] = None
 
 @app.cls(
     image=rag_image, 
@@ -45,52 +52,107 @@ class QueryResponse(BaseModel):
         modal.Secret.from_name("my-groq-secret")
     ], 
     volumes={"/data": vol},
-    keep_warm=1
+    keep_warm=1,
+    allow_concurrent_inputs=16
 )
 class Model:
     def __init__(self):
+        import threading
         self.engine = None
+        self.engine_lock = threading.Lock()
 
     def get_engine(self):
+        with self.engine_lock:
+            return self._get_engine()
+
+    def _get_engine(self):
         if self.engine is None:
-            from src import rag_engine, ingestion, config
-            import os
-
-            possible_paths = ["/data/faiss_index", "/data/data/faiss_index"]
-            final_path = "/data/faiss_index" 
-            
-            for p in possible_paths:
-                if os.path.exists(p) and "index.faiss" in os.listdir(p):
-                    final_path = p
-                    print(f"DEBUG: Found valid index at {p}")
+            import logging
+            from src import rag_engine, config, utils
+            from src.vector_store import index_exists
+
+            utils.setup_logging()
+            logger = logging.getLogger("src.modal_app")
+
+            # Check the two known upload locations directly instead of listing /data.
+            for p in ["/data/faiss_index", "/data/data/faiss_index"]:
+                if index_exists(p):
+                    config.INDEX_PATH = p
+                    logger.info("Using index at %s", p)
                     break
-            
-            config.INDEX_PATH = final_path
-            
-            if os.path.exists(config.INDEX_PATH):
-                print(f"DEBUG: Index found at {config.INDEX_PATH}. Files: {os.listdir(config.INDEX_PATH)}")
             else:
-                print(f"DEBUG: Index NOT FOUND at {config.INDEX_PATH}. Walking /data to debug:")
-                for root, dirs, files in os.walk("/data"):
-                    print(f"{root} -> {files}")
+                config.INDEX_PATH = "/data/faiss_index"
+                logger.error("Index NOT FOUND under /data. Upload one built with `python main.py --reindex`.")
 
-            print("Initializing RAG Engine (Lazy Load)...")
-            self.engine = rag_engine.RAGEngine()
+            logger.info("Initializing RAG Engine (Lazy Load)...")
+            # Concurrent inputs share reranker and query-embedding batches.
+            self.engine = rag_engine.RAGEngine(batching=True)
         return self.engine
 
+    @modal.enter()
+    def warmup(self):
+        """Runs once per container before it takes inputs: loads the engine's LLM
+        client, embeddings, index and reranker in parallel threads, so the first
+        request of a cold container does not pay for them."""
+        self.get_engine().warmup()
+
     @modal.method()
-    def process_query(self, query: str):
-        return self.get_engine().process_query(query)
+    def process_query(self, query: str, theme: Optional[str] = None, tags: Optional[List[str]] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None):
+        return self.get_engine().process_query(
+            query, theme=theme, tags=tags, date_from=date_from, date_to=date_to
+        )
 
     @modal.web_endpoint(method="POST", label="query")
-    def web_query(self, request: QueryRequest):
+    async def web_query(self, request: QueryRequest):
         try:
-            result = self.process_query.local(request.query)
+            result = await self.get_engine().aprocess_query(
+                request.query,
+                theme=request.theme,
+                tags=request.tags,
+                date_from=request.date_from,
+                date_to=request.date_to
+            )
             return result
         except Exception as e:
             from fastapi import HTTPException
             raise HTTPException(status_code=500, detail=str(e))
 
+    @modal.web_endpoint(method="POST", label="query-stream")
+    def web_query_stream(self, request: QueryRequest):
+        """Server-sent events: one `meta` event (reformulated query, references),
+        then `token` events as the answer is generated, then `done` with the TTFT."""
+        from fastapi.responses import StreamingResponse
+        engine = self.get_engine()
+
+        def events():
+            try:
+                for event in engine.stream_query(
+                    request.query,
+                    theme=request.theme,
+                    tags=request.tags,
+                    date_from=request.date_from,
+                    date_to=request.date_to
+                ):
+                    yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @modal.web_endpoint(method="GET", label="batching-stats")
+    def web_batching_stats(self):
+        """Queue depth and batch-size metrics of the cross-request batchers."""
+        return self.get_engine().batcher_stats()
+
+    @modal.web_endpoint(method="GET", label="metrics")
+    def web_metrics(self):
+        """Stage latency histograms and token/candidate/cache counters of this
+        container in Prometheus text format (scrape each container)."""
+        from fastapi.responses import PlainTextResponse
+        from src import tracing
+        return PlainTextResponse(tracing.METRICS.render(), media_type="text/plain; version=0.0.4")
+
     @modal.web_endpoint(method="POST", label="reindex")
     def admin_reindex(self, item: dict):
         return {"message": "Re-indexing logic needs data source connection"}
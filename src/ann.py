@@ -0,0 +1,76 @@
+import math
+import faiss
+import numpy as np
+from . import config
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "sq_fp16")
+
+def _ivf_nlist(count):
+    """IVF_NLIST, or about 4*sqrt(n) by default, capped so each list gets ~39 training points."""
+    nlist = config.IVF_NLIST or int(4 * math.sqrt(count))
+    return max(1, min(nlist, count // 39))
+
+def _pq_params(dim, count):
+    # The number of sub-quantizers must divide the dimension.
+    m = max(d for d in range(1, min(config.PQ_M, dim) + 1) if dim % d == 0)
+    # 2**nbits centroids per sub-quantizer need enough training points.
+    nbits = max(1, min(config.PQ_NBITS, int(math.log2(max(2, count // 39)))))
+    return m, nbits
+
+def factory_string(index_type, dim, count):
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{config.HNSW_M},Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{_ivf_nlist(count)},Flat"
+    if index_type == "ivf_pq":
+        m, nbits = _pq_params(dim, count)
+        return f"IVF{_ivf_nlist(count)},PQ{m}x{nbits}"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "sq_fp16":
+        return "SQfp16"
+    raise ValueError(f"Unknown index type '{index_type}'. Choose one of: {', '.join(INDEX_TYPES)}.")
+
+def build_from_vectors(vectors, index_type=None, batch_size=65536, train_size=100000, seed=0):
+    """Builds a FAISS index over a (possibly memory-mapped) float32 matrix.
+
+    Row i of `vectors` gets id i. Types that need training are trained on a random
+    sample of at most `train_size` rows; vectors are added in batches so a memmap
+    never has to be loaded in full.
+    """
+    index_type = index_type or config.INDEX_TYPE
+    count, dim = vectors.shape
+    description = factory_string(index_type, dim, count)
+    index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(count, size=min(count, train_size), replace=False))
+        index.train(np.ascontiguousarray(vectors[sample], dtype="float32"))
+
+    for start in range(0, count, batch_size):
+        index.add(np.ascontiguousarray(vectors[start:start + batch_size], dtype="float32"))
+    return index, description
+
+def search_parameters(index, nprobe=None, ef_search=None, selector=None):
+    """Per-query FAISS SearchParameters for the index type, or None if nothing is set.
+
+    Using per-call parameters (rather than mutating `index.nprobe`) keeps a shared
+    read-only index safe to search from several threads with different settings.
+    """
+    kwargs = {}
+    if selector is not None:
+        kwargs["sel"] = selector
+    if isinstance(index, faiss.IndexIVF):
+        if nprobe:
+            kwargs["nprobe"] = nprobe
+        return faiss.SearchParametersIVF(**kwargs) if kwargs else None
+    if isinstance(index, faiss.IndexHNSW):
+        if ef_search:
+            kwargs["efSearch"] = ef_search
+        return faiss.SearchParametersHNSW(**kwargs) if kwargs else None
+    return faiss.SearchParameters(**kwargs) if kwargs else None
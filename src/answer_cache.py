@@ -0,0 +1,119 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from . import config
+
+def normalize_query(query):
+    """Lower-cased, whitespace-collapsed query without surrounding punctuation."""
+    query = " ".join(query.lower().split())
+    return re.sub(r"^[\W_]+|[\W_]+$", "", query)
+
+def _filters_key(filters):
+    return json.dumps({k: v for k, v in (filters or {}).items() if v}, sort_keys=True, ensure_ascii=False)
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype="float32")
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class AnswerCache:
+    """In-process cache of full pipeline responses, keyed by query and filters.
+
+    Lookups try the normalized query text first and then, if `similarity` > 0,
+    the closest cached query embedding (cosine) with the same filters. Entries
+    expire after `ttl` seconds, the least recently used are evicted past
+    `max_entries`, and everything is dropped when the index build_id changes.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, similarity=None):
+        self.max_entries = config.ANSWER_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl = config.ANSWER_CACHE_TTL if ttl is None else ttl
+        self.similarity = config.ANSWER_CACHE_SIMILARITY if similarity is None else similarity
+        self.entries = OrderedDict()  # (filters, normalized query) -> entry, oldest first
+        self.build_id = None
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def semantic(self):
+        return self.similarity > 0
+
+    def _check_build(self, build_id):
+        if build_id != self.build_id:
+            self.entries.clear()
+            self.build_id = build_id
+
+    def _expire(self, now):
+        expired = [key for key, entry in self.entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self.entries[key]
+
+    def _closest(self, filters, vector):
+        candidates = [(key, e) for key, e in self.entries.items() if key[0] == filters and e["vector"] is not None]
+        if not candidates:
+            return None, 0.0
+        matrix = np.stack([e["vector"] for _, e in candidates])
+        scores = matrix @ _unit(vector)
+        best = int(np.argmax(scores))
+        return candidates[best][0], float(scores[best])
+
+    def get(self, query, build_id, filters=None, vector=None):
+        """Returns (response, match) where match is "exact" or "semantic", or (None, None).
+
+        Without `vector`, only the exact lookup is tried and a miss is not counted,
+        so callers can embed the query only when the exact lookup fails.
+        """
+        key = (_filters_key(filters), normalize_query(query))
+        with self.lock:
+            self._check_build(build_id)
+            self._expire(time.time())
+            match = "exact" if key in self.entries else None
+            if match is None and vector is not None and self.semantic:
+                closest, score = self._closest(key[0], vector)
+                if closest is not None and score >= self.similarity:
+                    key, match = closest, "semantic"
+            if match is None:
+                if vector is not None or not self.semantic:
+                    self.misses += 1
+                return None, None
+            self.entries.move_to_end(key)
+            self.hits[match] += 1
+            return self.entries[key]["response"], match
+
+    def put(self, query, build_id, response, filters=None, vector=None):
+        key = (_filters_key(filters), normalize_query(query))
+        with self.lock:
+            self._check_build(build_id)
+            self.entries[key] = {
+                "response": response,
+                "vector": None if vector is None else _unit(vector),
+                "created": time.time()
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        hits = self.hits["exact"] + self.hits["semantic"]
+        total = hits + self.misses
+        return {
+            "exact_hits": self.hits["exact"],
+            "semantic_hits": self.hits["semantic"],
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "entries": len(self.entries)
+        }
+
+def get_answer_cache():
+    """Shared cache from config, or None when ANSWER_CACHE_ENABLED is off."""
+    if not config.ANSWER_CACHE_ENABLED:
+        return None
+    return AnswerCache()
@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from langchain_core.embeddings import Embeddings
+from . import config
+
+class _Request:
+    def __init__(self, items):
+        self.items = items
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class DynamicBatcher:
+    """Merges concurrent calls of a batch function into shared batches.
+
+    Callers block in submit(items). A worker thread takes the first waiting
+    request, keeps collecting for up to `max_wait_ms` or until `max_batch_size`
+    items are queued, runs `fn` once on all items and hands each caller its
+    slice of the results (or the exception). A single request larger than
+    `max_batch_size` is run on its own rather than split.
+    """
+
+    def __init__(self, fn, max_batch_size=None, max_wait_ms=None, name="batch"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size or config.BATCH_MAX_SIZE
+        self.max_wait = (config.BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.name = name
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+        self.queue_depth = 0  # items submitted but not yet returned
+        self.metrics = {
+            "requests": 0,
+            "batches": 0,
+            "items": 0,
+            "max_queue_depth": 0,
+            "max_batch_size": 0,
+            "wait_seconds": 0.0,
+            "batch_sizes": {}  # power-of-two bucket -> batches
+        }
+
+    def _ensure_worker(self):
+        if self.worker is None:
+            with self.lock:
+                if self.worker is None:
+                    self.worker = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                    self.worker.start()
+
+    def submit(self, items):
+        """Runs `fn` on `items` as part of a shared batch and returns their results."""
+        items = list(items)
+        if not items:
+            return []
+        self._ensure_worker()
+        request = _Request(items)
+        with self.lock:
+            self.queue_depth += len(items)
+            self.metrics["requests"] += 1
+            self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], self.queue_depth)
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            size = len(batch[0].items)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.items)
+            self._execute(batch, size)
+
+    def _execute(self, batch, size):
+        started = time.monotonic()
+        items = [item for request in batch for item in request.items]
+        try:
+            results = list(self.fn(items))
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(items)} items.")
+            offset = 0
+            for request in batch:
+                request.result = results[offset:offset + len(request.items)]
+                offset += len(request.items)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+
+        with self.lock:
+            self.queue_depth -= size
+            self.metrics["batches"] += 1
+            self.metrics["items"] += size
+            self.metrics["max_batch_size"] = max(self.metrics["max_batch_size"], size)
+            self.metrics["wait_seconds"] += sum(started - r.enqueued for r in batch)
+            bucket = 1 << (size - 1).bit_length()
+            self.metrics["batch_sizes"][bucket] = self.metrics["batch_sizes"].get(bucket, 0) + 1
+        for request in batch:
+            request.done.set()
+
+    def stats(self):
+        with self.lock:
+            m = dict(self.metrics, batch_sizes=dict(sorted(self.metrics["batch_sizes"].items())))
+            batches = m["batches"]
+            m["queue_depth"] = self.queue_depth
+            m["mean_batch_size"] = round(m["items"] / batches, 2) if batches else 0.0
+            m["mean_requests_per_batch"] = round(m["requests"] / batches, 2) if batches else 0.0
+            m["mean_wait_ms"] = round(m.pop("wait_seconds") * 1000 / m["requests"], 2) if m["requests"] else 0.0
+        return m
+
+def _embed_queries(embeddings, texts):
+    """One provider call for several queries, embedded as queries (not documents)."""
+    try:
+        return embeddings.embed_documents(texts, task_type="retrieval_query")
+    except TypeError:
+        # Providers without a task_type switch: fall back to one call per query.
+        return [embeddings.embed_query(t) for t in texts]
+
+class BatchedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper whose embed_query calls from concurrent requests share batches."""
+
+    def __init__(self, inner, max_batch_size=None, max_wait_ms=None):
+        self.inner = inner
+        self.batcher = DynamicBatcher(
+            lambda texts: _embed_queries(inner, texts),
+            max_batch_size=max_batch_size or config.EMBED_QUERY_MAX_BATCH,
+            max_wait_ms=max_wait_ms,
+            name="query-embedding"
+        )
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.batcher.submit([text])[0]
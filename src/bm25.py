@@ -0,0 +1,215 @@
+import functools
+import json
+import os
+import re
+from array import array
+import numpy as np
+from . import config
+
+# Index directory layout (inside the vector index directory, see vector_store.py):
+#   bm25.json       parameters, document count, average length, vocabulary
+#   postings.u32    row numbers of every posting list, back to back
+#   freqs.u16       term frequency of each posting
+#   offsets.u64     n_terms+1 offsets into the two files above
+#   doclen.u32      token count of each row
+META_FILE = "bm25.json"
+POSTINGS_FILE = "postings.u32"
+FREQS_FILE = "freqs.u16"
+OFFSETS_FILE = "offsets.u64"
+DOCLEN_FILE = "doclen.u32"
+
+STOPWORDS = frozenset("""
+ada adalah agar akan aku anda apa apabila apakah atas atau bagaimana bagi bahwa
+banyak baru begitu belum berapa beberapa bisa boleh buat bukan dalam dan dapat
+dari demikian dengan di dia ia ialah ini itu jadi jika juga justru kalau kami
+kamu karena ke kemudian kenapa ketika kita lagi lain lalu maka masih mau melalui
+memang mengapa mereka meski misalnya mungkin namun oleh pada para per perlu pula
+saat saja sama sampai sangat saya se sebagai sebelum sedang sehingga sejak
+seperti serta setelah siapa suatu sudah supaya tanpa tapi telah tentang tersebut
+tetapi tidak untuk walaupun yaitu yakni yang
+""".split())
+
+# Statute citations become a single token (e.g. "UU No. 13 Tahun 2003" -> "uu:13/2003")
+# so an exact reference outranks documents that merely share the numbers.
+_STATUTE_TYPES = (
+    (r"undang[-\s]*undang|uu", "uu"),
+    (r"peraturan\s+pemerintah\s+pengganti\s+undang[-\s]*undang|perppu|perpu", "perppu"),
+    (r"peraturan\s+pemerintah|pp", "pp"),
+    (r"peraturan\s+presiden|perpres", "perpres"),
+    (r"peraturan\s+menteri|permen\w*", "permen"),
+    (r"peraturan\s+daerah|perda", "perda"),
+)
+_STATUTE_RE = re.compile(
+    r"\b(?P<type>" + "|".join(f"(?P<t{i}>{p})" for i, (p, _) in enumerate(_STATUTE_TYPES)) + r")"
+    r"\s*(?:(?:nomor|no\.?)\s*)?(?P<number>\d+)(?:\s*/\s*|\s+tahun\s+)(?P<year>\d{4})\b"
+)
+_ARTICLE_RE = re.compile(r"\b(pasal|ayat|bab|huruf)\s+(\(?)(\d+[a-z]?|[a-z])\)?(?=\W|$)")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+_PARTICLES = ("kah", "lah", "tah", "pun")
+_POSSESSIVES = ("nya", "ku", "mu")
+_PREFIXES = (
+    ("meny", "s"), ("peny", "s"), ("meng", ""), ("peng", ""), ("mem", "p"), ("pem", "p"),
+    ("men", ""), ("pen", ""), ("ber", ""), ("be", ""), ("ter", ""), ("per", ""), ("di", ""), ("ke", ""),
+    ("me", ""), ("pe", ""), ("se", "")
+)
+_VOWELS = "aeiou"
+
+@functools.lru_cache(maxsize=65536)
+def stem(word):
+    """Light Indonesian stemmer: particles, possessives, one suffix, one prefix.
+
+    Deliberately conservative; the same function runs on queries and documents,
+    so it only has to map inflected forms together, not recover the true root.
+    """
+    if len(word) <= 4 or not word.isalpha():
+        return word
+    for suffix in _PARTICLES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            break
+    for suffix in _POSSESSIVES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            break
+    for prefix, replacement in _PREFIXES:
+        rest = word[len(prefix):]
+        if word.startswith(prefix) and len(replacement + rest) >= 4:
+            if replacement and rest[0] not in _VOWELS:
+                continue
+            word = replacement + rest
+            break
+    for suffix in ("kan", "an", "i"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            break
+    return word
+
+def _statute_type(match):
+    for i, (_, name) in enumerate(_STATUTE_TYPES):
+        if match.group(f"t{i}"):
+            return name
+
+def tokenize(text):
+    """Lower-cased, stop-word-free, stemmed tokens plus compound legal tokens
+    ("uu:13/2003", "pasal:28"). The plain words of a citation are kept too."""
+    text = text.lower()
+    tokens = [
+        f"{_statute_type(m)}:{m.group('number')}/{m.group('year')}"
+        for m in _STATUTE_RE.finditer(text)
+    ]
+    tokens.extend(f"{m.group(1)}:{m.group(3)}" for m in _ARTICLE_RE.finditer(text))
+    for word in _WORD_RE.findall(text):
+        # Reduplicated plurals ("pekerja-pekerja") count as the base word.
+        parts = word.split("-")
+        if len(parts) == 2 and parts[0] == parts[1]:
+            word = parts[0]
+        for part in (word.split("-") if "-" in word else (word,)):
+            if part not in STOPWORDS:
+                tokens.append(stem(part))
+    return tokens
+
+def document_text(text, metadata):
+    """Text indexed for a chunk: its title and content."""
+    return f"{metadata.get('title', '')}\n{text}"
+
+def build_index(store, path):
+    """Builds the BM25 inverted index for every row of a ChunkStore into `path`."""
+    os.makedirs(path, exist_ok=True)
+    vocabulary = {}
+    postings = []
+    doclens = array("I")
+    for row in range(len(store)):
+        counts = {}
+        tokens = tokenize(document_text(store.value("text", row), {"title": store.value("title", row)}))
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        doclens.append(len(tokens))
+        for token, tf in counts.items():
+            term = vocabulary.get(token)
+            if term is None:
+                term = vocabulary[token] = len(postings)
+                postings.append((array("I"), array("H")))
+            postings[term][0].append(row)
+            postings[term][1].append(min(tf, 65535))
+
+    terms = sorted(vocabulary)
+    offsets = array("Q", [0])
+    with open(os.path.join(path, POSTINGS_FILE), "wb") as rows_file, \
+            open(os.path.join(path, FREQS_FILE), "wb") as freqs_file:
+        for token in terms:
+            rows, freqs = postings[vocabulary[token]]
+            rows.tofile(rows_file)
+            freqs.tofile(freqs_file)
+            offsets.append(offsets[-1] + len(rows))
+    np.asarray(offsets, dtype="<u8").tofile(os.path.join(path, OFFSETS_FILE))
+    np.asarray(doclens, dtype="<u4").tofile(os.path.join(path, DOCLEN_FILE))
+
+    meta = {
+        "count": len(doclens),
+        "avgdl": (sum(doclens) / len(doclens)) if doclens else 0.0,
+        "terms": terms
+    }
+    with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+def _map(path, dtype):
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+class BM25Index:
+    """Memory-mapped BM25 (Okapi) index over the rows of a vector index."""
+
+    def __init__(self, path, k1=None, b=None):
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.term_ids = {term: i for i, term in enumerate(meta["terms"])}
+        self.k1 = config.BM25_K1 if k1 is None else k1
+        self.b = config.BM25_B if b is None else b
+        self.postings = _map(os.path.join(path, POSTINGS_FILE), "<u4")
+        self.freqs = _map(os.path.join(path, FREQS_FILE), "<u2")
+        self.offsets = _map(os.path.join(path, OFFSETS_FILE), "<u8")
+        doclens = _map(os.path.join(path, DOCLEN_FILE), "<u4").astype("float32")
+        # Length normalisation is per row and query independent, so compute it once.
+        self.norms = self.k1 * (1 - self.b + self.b * doclens / self.avgdl)
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    def __len__(self):
+        return self.count
+
+    def scores(self, query):
+        """BM25 score of every row for `query` (float32 array, zero where nothing matched)."""
+        scores = np.zeros(self.count, dtype="float32")
+        for token in set(tokenize(query)):
+            term = self.term_ids.get(token)
+            if term is None:
+                continue
+            start, end = int(self.offsets[term]), int(self.offsets[term + 1])
+            rows = self.postings[start:end]
+            tf = self.freqs[start:end].astype("float32")
+            df = end - start
+            idf = np.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + self.norms[rows])
+        return scores
+
+    def search(self, query, k=10, rows=None):
+        """Returns (rows, scores) of the k best-matching rows, best first.
+
+        `rows` (sorted row numbers, e.g. a metadata Selection) restricts the result.
+        """
+        scores = self.scores(query)
+        if rows is None:
+            matched = np.flatnonzero(scores)
+        else:
+            matched = rows[scores[rows] > 0]
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = np.argsort(-scores[matched], kind="stable")
+        return matched[order], scores[matched[order]]
@@ -0,0 +1,118 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from langchain_core.documents import Document
+
+# One pair of files per column: `<column>.dat` holds the UTF-8 values back to back,
+# `<column>.off` holds n+1 little-endian uint64 offsets into it. Reading row i of a
+# column is two offset lookups and one slice of a memory-mapped file.
+COLUMNS = ("chunk_id", "text", "title", "link", "publish_date", "theme", "tags")
+METADATA_COLUMNS = ("title", "link", "publish_date", "theme")
+
+_OFFSET = struct.Struct("<Q")
+_OFFSET_PAIR = struct.Struct("<QQ")
+
+def _column_values(chunk_id, text, metadata):
+    values = {
+        "chunk_id": chunk_id,
+        "text": text,
+        "tags": json.dumps(metadata.get("tags", []), ensure_ascii=False)
+    }
+    for column in METADATA_COLUMNS:
+        value = metadata.get(column, "")
+        values[column] = "" if value is None else str(value)
+    return values
+
+class ChunkStoreWriter:
+    """Append-only writer; rows are numbered in the order they are added."""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.count = 0
+        self.columns = {}
+        for column in COLUMNS:
+            data = open(os.path.join(path, f"{column}.dat"), "wb")
+            offsets = open(os.path.join(path, f"{column}.off"), "wb")
+            offsets.write(_OFFSET.pack(0))
+            self.columns[column] = [data, offsets, 0]
+
+    def add(self, chunk_id, text, metadata):
+        for column, value in _column_values(chunk_id, text, metadata).items():
+            raw = value.encode("utf-8")
+            entry = self.columns[column]
+            entry[0].write(raw)
+            entry[2] += len(raw)
+            entry[1].write(_OFFSET.pack(entry[2]))
+        self.count += 1
+        return self.count - 1
+
+    def close(self):
+        for data, offsets, _ in self.columns.values():
+            data.close()
+            offsets.close()
+
+def _map_file(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class ChunkStore:
+    """Read-only, lazily memory-mapped view of a ChunkStoreWriter directory.
+
+    Opening a store maps nothing; each column is mapped on first access and pages
+    are faulted in only for the rows actually read, so several processes reading
+    the same files share the OS page cache.
+    """
+
+    def __init__(self, path, count):
+        self.path = path
+        self.count = count
+        self._columns = {}
+        self._row_by_chunk_id = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def _column(self, column):
+        mapped = self._columns.get(column)
+        if mapped is None:
+            with self._lock:
+                mapped = self._columns.get(column)
+                if mapped is None:
+                    mapped = (
+                        _map_file(os.path.join(self.path, f"{column}.dat")),
+                        _map_file(os.path.join(self.path, f"{column}.off"))
+                    )
+                    self._columns[column] = mapped
+        return mapped
+
+    def value(self, column, row):
+        if not 0 <= row < self.count:
+            raise IndexError(f"Row {row} out of range for a store of {self.count} chunks.")
+        data, offsets = self._column(column)
+        start, end = _OFFSET_PAIR.unpack_from(offsets, row * _OFFSET.size)
+        return data[start:end].decode("utf-8")
+
+    def metadata(self, row):
+        metadata = {column: self.value(column, row) for column in METADATA_COLUMNS}
+        metadata["tags"] = json.loads(self.value("tags", row) or "[]")
+        metadata["chunk_id"] = self.value("chunk_id", row)
+        metadata["row"] = row
+        return metadata
+
+    def document(self, row):
+        return Document(page_content=self.value("text", row), metadata=self.metadata(row))
+
+    def documents(self, rows):
+        return [self.document(row) for row in rows]
+
+    def row_of(self, chunk_id):
+        """Row number for a chunk ID (builds the lookup table on first use)."""
+        if self._row_by_chunk_id is None:
+            self._row_by_chunk_id = {self.value("chunk_id", row): row for row in range(self.count)}
+        return self._row_by_chunk_id.get(chunk_id)
@@ -0,0 +1,79 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from . import config
+
+_worker_splitter = None
+
+def get_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=config.CHUNK_SIZE,
+        chunk_overlap=config.CHUNK_OVERLAP
+    )
+
+def _init_worker(chunk_size, chunk_overlap):
+    global _worker_splitter
+    _worker_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+
+def _split_texts(texts):
+    return [_worker_splitter.split_text(text) for text in texts]
+
+def resolve_workers(workers=None):
+    """CHUNK_WORKERS semantics: 0 or 1 = serial, -1 = one process per CPU."""
+    workers = config.CHUNK_WORKERS if workers is None else workers
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+def iter_split(articles, workers=None, task_size=None):
+    """Splits articles into chunk texts, serially or in a process pool.
+
+    Args:
+        articles: Iterable of (payload, Document), consumed lazily.
+        workers: Process count (see resolve_workers); defaults to CHUNK_WORKERS.
+        task_size: Articles per pool task, to amortise inter-process overhead.
+
+    Yields:
+        (payload, Document, [chunk texts]) in input order, whatever the worker
+        count, so chunk order and the IDs derived from it are deterministic.
+    """
+    workers = resolve_workers(workers)
+    if workers <= 1:
+        splitter = get_splitter()
+        for payload, doc in articles:
+            yield payload, doc, splitter.split_text(doc.page_content)
+        return
+
+    task_size = task_size or config.CHUNK_TASK_SIZE
+    max_pending = workers * 4
+    pending = deque()
+    iterator = iter(articles)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+    ) as pool:
+        exhausted = False
+        while not exhausted or pending:
+            # Keep a bounded window of tasks in flight so a large corpus is never
+            # fully materialised; results are still yielded strictly in order.
+            while not exhausted and len(pending) < max_pending:
+                group = []
+                for item in iterator:
+                    group.append(item)
+                    if len(group) >= task_size:
+                        break
+                if not group:
+                    exhausted = True
+                    break
+                texts = [doc.page_content for _, doc in group]
+                pending.append((group, pool.submit(_split_texts, texts)))
+            if pending:
+                group, future = pending.popleft()
+                for (payload, doc), chunks in zip(group, future.result()):
+                    yield payload, doc, chunks
@@ -0,0 +1,183 @@
+import heapq
+import json
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from . import config
+
+_WORD_RE = re.compile(r"\S+")
+
+def _word_spans(text):
+    return [(m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+
+def _shingles(text, spans, size):
+    """Stable 32-bit hashes of every `size`-word window, in order."""
+    words = [text[s:e] for s, e in spans]
+    return [
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    ]
+
+class BoilerplateModel:
+    """Learns site chrome as word shingles that recur in many articles.
+
+    Hukumonline pages start with the same navigation bar and end with the same
+    "Klinik Terbaru / Tips Hukum" widgets. Any `shingle_size`-word window found in
+    at least `min_doc_fraction` of the articles (and `min_docs` of them) is treated
+    as boilerplate, and every word covered by such a window is removed.
+    """
+
+    def __init__(self, shingle_size=None, min_doc_fraction=None, min_docs=5):
+        self.shingle_size = shingle_size or config.BOILERPLATE_SHINGLE_SIZE
+        self.min_doc_fraction = min_doc_fraction or config.BOILERPLATE_MIN_DOC_FRACTION
+        self.min_docs = min_docs
+        self.doc_freq = Counter()
+        self.num_docs = 0
+        self.boilerplate = set()
+
+    def add(self, text):
+        self.doc_freq.update(set(_shingles(text, _word_spans(text), self.shingle_size)))
+        self.num_docs += 1
+
+    def finalize(self):
+        threshold = max(self.min_docs, math.ceil(self.min_doc_fraction * self.num_docs))
+        self.boilerplate = {h for h, n in self.doc_freq.items() if n >= threshold}
+        self.doc_freq = Counter()
+        return self
+
+    def fit(self, texts):
+        for text in texts:
+            self.add(text)
+        return self.finalize()
+
+    @property
+    def fitted(self):
+        return bool(self.boilerplate)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"shingle_size": self.shingle_size, "shingles": sorted(self.boilerplate)}, f)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a saved model, or returns an unfitted one if `path` does not exist."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        model = cls(shingle_size=data["shingle_size"])
+        model.boilerplate = set(data["shingles"])
+        return model
+
+    def strip(self, text):
+        if not self.boilerplate:
+            return text
+        spans = _word_spans(text)
+        covered = [False] * len(spans)
+        for i, h in enumerate(_shingles(text, spans, self.shingle_size)):
+            if h in self.boilerplate:
+                for j in range(i, i + self.shingle_size):
+                    covered[j] = True
+
+        # Cut whole covered runs out of the original string so the remaining
+        # whitespace and line breaks are preserved for the splitter.
+        pieces = []
+        last = 0
+        i = 0
+        while i < len(spans):
+            if not covered[i]:
+                i += 1
+                continue
+            start = spans[i][0]
+            while i < len(spans) and covered[i]:
+                i += 1
+            end = spans[i][0] if i < len(spans) else len(text)
+            pieces.append(text[last:start])
+            last = end
+        pieces.append(text[last:])
+        return "".join(pieces).strip()
+
+class NearDuplicateFilter:
+    """Flags articles whose text nearly matches an earlier one (bottom-k MinHash sketch)."""
+
+    def __init__(self, threshold=None, shingle_size=5, sketch_size=64):
+        self.threshold = threshold or config.NEAR_DUPLICATE_THRESHOLD
+        self.shingle_size = shingle_size
+        self.sketch_size = sketch_size
+        self.sketches = {}
+        self.postings = {}
+
+    def _sketch(self, text):
+        words = text.lower().split()
+        if len(words) < self.shingle_size:
+            words = words + [""] * (self.shingle_size - len(words))
+        hashes = set()
+        for i in range(len(words) - self.shingle_size + 1):
+            data = " ".join(words[i:i + self.shingle_size]).encode("utf-8")
+            hashes.add((zlib.crc32(data) << 32) | zlib.adler32(data))
+        return frozenset(heapq.nsmallest(self.sketch_size, hashes))
+
+    def _similarity(self, a, b):
+        union_bottom = heapq.nsmallest(self.sketch_size, a | b)
+        shared = a & b
+        return sum(1 for h in union_bottom if h in shared) / len(union_bottom)
+
+    def check(self, key, text):
+        """Returns the key of the article `text` duplicates, or registers it and returns None."""
+        sketch = self._sketch(text)
+        candidates = Counter()
+        for h in sketch:
+            for other in self.postings.get(h, ()):
+                candidates[other] += 1
+        for other, _ in candidates.most_common():
+            if self._similarity(sketch, self.sketches[other]) >= self.threshold:
+                return other
+        self.sketches[key] = sketch
+        for h in sketch:
+            self.postings.setdefault(h, []).append(key)
+        return None
+
+def estimate_chunks(length):
+    """Approximate number of splitter chunks for a text of `length` characters."""
+    if length <= 0:
+        return 0
+    if length <= config.CHUNK_SIZE:
+        return 1
+    step = config.CHUNK_SIZE - config.CHUNK_OVERLAP
+    return math.ceil((length - config.CHUNK_OVERLAP) / step)
+
+class CleaningReport:
+    def __init__(self):
+        self.articles = 0
+        self.duplicates = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.chunks_before = 0
+        self.chunks_after = 0
+
+    def record(self, raw_text, cleaned_text=None):
+        """`cleaned_text` is None for an article dropped as a duplicate."""
+        self.articles += 1
+        self.bytes_before += len(raw_text.encode("utf-8"))
+        self.chunks_before += estimate_chunks(len(raw_text))
+        if cleaned_text is None:
+            self.duplicates += 1
+            return
+        self.bytes_after += len(cleaned_text.encode("utf-8"))
+        self.chunks_after += estimate_chunks(len(cleaned_text))
+
+    def summary(self):
+        batch = config.EMBED_BATCH_SIZE
+        calls_before = math.ceil(self.chunks_before / batch)
+        calls_after = math.ceil(self.chunks_after / batch)
+        saved_bytes = self.bytes_before - self.bytes_after
+        pct = 100.0 * saved_bytes / self.bytes_before if self.bytes_before else 0.0
+        return (
+            f"Cleaning: {self.articles} articles, {self.duplicates} near-duplicates dropped; "
+            f"{saved_bytes:,} bytes removed ({pct:.1f}%); "
+            f"~{self.chunks_before - self.chunks_after} fewer chunks "
+            f"({self.chunks_before} -> {self.chunks_after}); "
+            f"~{calls_before - calls_after} fewer embedding calls ({calls_before} -> {calls_after})."
+        )
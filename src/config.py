@@ -7,16 +7,159 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 if not GOOGLE_API_KEY:
     pass 
 
+# Level of the pipeline's own loggers ("src.*"); third-party libraries stay at WARNING
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "0"))  # 0/1 = serial, -1 = one process per CPU
+CHUNK_TASK_SIZE = 16  # articles per process-pool task
+
+# Corpus cleaning in ingestion.load_data()
+CLEAN_BOILERPLATE = os.getenv("CLEAN_BOILERPLATE", "true").lower() == "true"
+BOILERPLATE_SHINGLE_SIZE = 8
+BOILERPLATE_MIN_DOC_FRACTION = 0.2
+BOILERPLATE_SAMPLE_DOCS = 2000  # articles streamed to learn boilerplate; bounds memory
+NEAR_DUPLICATE_THRESHOLD = 0.9
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower() # Options: "gemini", "groq"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL")
 
+# Embedding provider for ingestion and queries (src/embedding_providers.py): "google" (Gemini
+# API) or "local" (sentence-transformers on CPU, no network at query time).
+# An index only works with the provider and model that built it.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google").lower()
 EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_API_BASE = os.getenv("EMBEDDING_API_BASE", "https://generativelanguage.googleapis.com")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "intfloat/multilingual-e5-small")
+LOCAL_EMBEDDING_BACKEND = os.getenv("LOCAL_EMBEDDING_BACKEND", "torch").lower()  # "torch" or "onnx"
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+
+# Batch embedding scheduler used by ingestion (limits follow the provider quota)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_RPM = int(os.getenv("EMBED_RPM", "1500"))
+EMBED_TPM = int(os.getenv("EMBED_TPM", "1000000"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+# LLM rate limits per provider, shared by every request of the process
+# (including concurrent RAGEngine.process_queries workers); 0 disables a limit
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = int(os.getenv("GROQ_TPM", "6000"))
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "15"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+# Completion tokens (<think> block included) reserved per LLM call before it is
+# made; the reservation is corrected by the reported usage afterwards
+LLM_COMPLETION_RESERVE = int(os.getenv("LLM_COMPLETION_RESERVE", "1024"))
+# Retries of a query that hit the provider's 429 in RAGEngine.process_queries
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+# Queries run at once by RAGEngine.process_queries
+QUERY_CONCURRENCY = int(os.getenv("QUERY_CONCURRENCY", "4"))
 LLM_MODEL = "qwen/qwen3-32b"
 
+# Vector index type built by ingestion: flat, hnsw, ivf_flat, ivf_pq, sq8, sq_fp16
+# (see src/evaluation/benchmark_ann.py for the recall/latency trade-offs)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat").lower()
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = about 4*sqrt(n)
+PQ_M = 48
+PQ_NBITS = 8
+# Query-time defaults, overridable per RAGEngine
+NPROBE = int(os.getenv("NPROBE", "16"))
+EF_SEARCH = int(os.getenv("EF_SEARCH", "64"))
+
+# Retrieval mode per hop: "dense" (FAISS), "bm25" (keyword index, no embedding call)
+# or "hybrid" (both, fused with reciprocal rank fusion)
+HOP1_RETRIEVAL = os.getenv("HOP1_RETRIEVAL", "hybrid").lower()
+HOP2_RETRIEVAL = os.getenv("HOP2_RETRIEVAL", "hybrid").lower()
+HYBRID_CANDIDATES = 30  # per-retriever depth fused in hybrid mode
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Hop-2 candidate diversification (src/diversity.py): of the top MMR_POOL retrieved
+# chunks, maximal marginal relevance over the stored vectors picks MMR_CANDIDATES
+# for the reranker, at most MMR_MAX_PER_ARTICLE from one article. MMR_LAMBDA
+# weighs retrieval rank against similarity to chunks already picked (1 = rank only).
+DIVERSIFY_CANDIDATES = os.getenv("DIVERSIFY_CANDIDATES", "true").lower() == "true"
+MMR_POOL = int(os.getenv("MMR_POOL", "20"))
+MMR_CANDIDATES = int(os.getenv("MMR_CANDIDATES", "10"))
+MMR_MAX_PER_ARTICLE = int(os.getenv("MMR_MAX_PER_ARTICLE", "2"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+
+# Filtered dense search scans the selected vectors directly when at most this many
+# rows match; larger selections are searched inside FAISS with an ID selector.
+FILTER_BRUTE_FORCE_MAX = 20000
+
+# Response cache in front of RAGEngine.process_query (exact, then semantic match)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))  # seconds
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))  # cosine; 0 = exact only
+
+# Hop-1 confidence router: when hop 1 already looks confident, process_query skips
+# reformulation and reranks candidates for the original query directly.
+#   "rerank"     max CrossEncoder score of the hop-1 docs (logit)
+#   "similarity" max cosine similarity between query and hop-1 doc embeddings
+#   "off"        always run the full double-hop pipeline
+HOP_ROUTER = os.getenv("HOP_ROUTER", "rerank").lower()
+ROUTER_RERANK_THRESHOLD = float(os.getenv("ROUTER_RERANK_THRESHOLD", "7.0"))
+ROUTER_SIMILARITY_THRESHOLD = float(os.getenv("ROUTER_SIMILARITY_THRESHOLD", "0.85"))
+
+# Cross-encoder reranker: backend "torch", "int8" (dynamic quantization) or "onnx"
+# (see src/evaluation/benchmark_reranker.py for latency and ranking agreement)
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch").lower()
+RERANKER_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", "384"))  # tokens per query+chunk pair
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", "16"))
+RERANKER_CACHE_SIZE = 20000  # (query, chunk_id) scores kept in memory
+
+# Cross-request micro-batching of reranker pairs and query embeddings (serving layer)
+BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "false").lower() == "true"
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))  # reranker pairs per batch
+EMBED_QUERY_MAX_BATCH = 32
+
 DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "faiss_index")
+
+# On-disk embedding cache shared by ingestion and query time ("" disables it)
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "embeddings.sqlite")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Persistent cache of hop-1 query reformulations ("" disables it). Bump the prompt
+# version whenever the reformulation template in rag_engine.py changes.
+REFORMULATION_PROMPT_VERSION = 2
+REFORMULATION_CACHE_PATH = os.getenv(
+    "REFORMULATION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "reformulations.sqlite")
+)
+REFORMULATION_CACHE_MAX_ENTRIES = int(os.getenv("REFORMULATION_CACHE_MAX_ENTRIES", "50000"))
+
+# Context packing for LLM prompts (src/context_packer.py): chunks of one article
+# are merged under a single header and the context is capped at this many
+# (estimated) tokens, filled in rerank order
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "true").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_MIN_OVERLAP = 20  # shortest shared text (chars) treated as chunk overlap
+
+# Offline evaluation (src/evaluation/benchmark_offline.py): hashed bag-of-words
+# embeddings of this size and a separate index built with them
+OFFLINE_EMBEDDING_DIM = 512
+OFFLINE_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "offline_index")
+
+# Self-hosted HTTP server (src/server.py). Limits are per worker process: at most
+# SERVER_CONCURRENCY pipelines run at once, SERVER_QUEUE_SIZE more requests wait
+# for a slot and anything beyond is answered 429; a request still unanswered after
+# SERVER_REQUEST_TIMEOUT seconds (queue wait included) gets 504.
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+SERVER_CONCURRENCY = int(os.getenv("SERVER_CONCURRENCY", "8"))
+SERVER_QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", "32"))
+SERVER_REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "60"))
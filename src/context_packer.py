@@ -0,0 +1,97 @@
+from . import config, utils
+from .diversity import article_key
+from .embedding_pipeline import estimate_tokens
+
+GAP = "\n[...]\n"  # between non-adjacent chunks of one article
+
+def chunk_position(doc):
+    """(article prefix, chunk index) parsed from a "<article>-<hash>-<i>" chunk ID, or None."""
+    chunk_id = doc.metadata.get("chunk_id") or ""
+    prefix, _, index = chunk_id.rpartition("-")
+    if not prefix or not index.isdigit():
+        return None
+    return prefix, int(index)
+
+def overlap_length(left, right, max_overlap=None, min_overlap=None):
+    """Length of the longest suffix of `left` that is also a prefix of `right`;
+    0 when it is shorter than `min_overlap` (default CONTEXT_MIN_OVERLAP)."""
+    max_overlap = config.CHUNK_OVERLAP if max_overlap is None else max_overlap
+    min_overlap = config.CONTEXT_MIN_OVERLAP if min_overlap is None else min_overlap
+    for size in range(min(len(left), len(right), max_overlap), max(min_overlap, 1) - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+class _Article:
+    def __init__(self, meta):
+        self.meta = meta
+        self.chunks = []  # (position or None, text)
+
+    def text(self):
+        """Chunks in document order; neighbours merged without their shared overlap."""
+        positioned = sorted((p, t) for p, t in self.chunks if p is not None)
+        ordered = positioned + [(None, t) for p, t in self.chunks if p is None]
+        merged = 0
+        parts = []
+        previous = None
+        for position, text in ordered:
+            if parts and position is not None and previous is not None \
+                    and position[0] == previous[0] and position[1] == previous[1] + 1:
+                size = overlap_length(parts[-1], text)
+                parts[-1] += text[size:] if size else "\n" + text
+                merged += 1
+            else:
+                parts.append(text)
+            previous = position
+        return GAP.join(parts), merged
+
+    def section(self):
+        text, _ = self.text()
+        return utils.format_section(self.meta, text)
+
+def pack(docs, budget=None):
+    """Builds the LLM context for `docs` (in rerank order) within `budget` tokens.
+
+    Chunks are grouped by article `link`, each article gets one metadata header,
+    adjacent chunks are merged with their CHUNK_OVERLAP removed, and articles
+    appear in the order of their best-ranked chunk. Chunks are taken in rerank
+    order while they fit the budget (default CONTEXT_TOKEN_BUDGET); the first
+    one is always kept.
+
+    Returns (context text, stats) where stats compares the estimated token count
+    with that of utils.format_docs_with_metadata on the same docs.
+    """
+    budget = config.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    articles = {}
+    used = 0
+    tokens = 0
+    for doc in docs:
+        key = article_key(doc)
+        article = articles.get(key)
+        new_article = article is None
+        if new_article:
+            article = _Article(doc.metadata)
+        before = 0 if new_article else estimate_tokens(article.section())
+        article.chunks.append((chunk_position(doc), doc.page_content))
+        cost = estimate_tokens(article.section()) - before
+        if used and tokens + cost > budget:
+            article.chunks.pop()
+            continue
+        if new_article:
+            articles[key] = article
+        used += 1
+        tokens += cost
+
+    text = "\n\n".join(article.section() for article in articles.values())
+    baseline = estimate_tokens(utils.format_docs_with_metadata(docs)) if docs else 0
+    tokens = estimate_tokens(text) if text else 0
+    stats = {
+        "chunks": len(docs),
+        "chunks_used": used,
+        "articles": len(articles),
+        "merged": sum(article.text()[1] for article in articles.values()),
+        "tokens": tokens,
+        "baseline_tokens": baseline,
+        "tokens_saved": baseline - tokens
+    }
+    return text, stats
@@ -0,0 +1,59 @@
+import numpy as np
+from . import config
+
+def article_key(doc):
+    return doc.metadata.get("link") or doc.metadata.get("title") or id(doc)
+
+def mmr(relevance, vectors, k, lambda_mult=None, groups=None, max_per_group=None):
+    """Indices of up to `k` items in maximal marginal relevance order.
+
+    Each step picks the item maximizing
+        lambda_mult * relevance - (1 - lambda_mult) * (max similarity to the picked items),
+    with cosine similarities between `vectors` rescaled to [0, 1] over the pool so
+    they weigh like `relevance` (expected in [0, 1]). Items sharing a `groups`
+    value stop being eligible once `max_per_group` of them are picked.
+    """
+    lambda_mult = config.MMR_LAMBDA if lambda_mult is None else lambda_mult
+    relevance = np.asarray(relevance, dtype="float32")
+    n = len(relevance)
+    vectors = np.asarray(vectors, dtype="float32")
+    unit = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    similarity = unit @ unit.T
+    low, high = similarity.min(), similarity.max()
+    similarity = (similarity - low) / (high - low) if high > low else np.zeros_like(similarity)
+
+    groups = np.asarray(groups) if groups is not None else None
+    available = np.ones(n, dtype=bool)
+    redundancy = np.zeros(n, dtype="float32")
+    picked = []
+    counts = {}
+    while len(picked) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        i = int(np.argmax(scores))
+        picked.append(i)
+        available[i] = False
+        np.maximum(redundancy, similarity[i], out=redundancy)
+        if groups is not None and max_per_group:
+            counts[groups[i]] = counts.get(groups[i], 0) + 1
+            if counts[groups[i]] >= max_per_group:
+                available &= groups != groups[i]
+    return picked
+
+def select(docs, vectors, k=None, lambda_mult=None, max_per_article=None):
+    """Diverse subset of `docs` (in retrieval order) for the reranker, in MMR order.
+
+    Relevance is the retrieval rank (1 for the first doc down to 0), so the
+    hybrid/BM25 fusion keeps deciding what is relevant; `vectors` (the stored
+    index vectors of the docs, nothing is re-embedded) only decide what is
+    redundant. At most `max_per_article` chunks of one article are kept.
+    """
+    k = config.MMR_CANDIDATES if k is None else k
+    max_per_article = config.MMR_MAX_PER_ARTICLE if max_per_article is None else max_per_article
+    if len(docs) <= 1:
+        return list(docs)
+    relevance = 1.0 - np.arange(len(docs)) / (len(docs) - 1)
+    keys = {}
+    groups = [keys.setdefault(article_key(d), len(keys)) for d in docs]
+    picked = mmr(relevance, vectors, k, lambda_mult, groups, max_per_article)
+    return [docs[i] for i in picked]
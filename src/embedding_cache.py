@@ -0,0 +1,69 @@
+import hashlib
+from array import array
+from langchain_core.embeddings import Embeddings
+from . import config, embedding_providers, tracing
+from .cache import SQLiteCache
+
+def cache_key(model, task, text):
+    """Key for one embedding; the task matters because query and document vectors differ."""
+    return hashlib.sha256(f"{model}\x00{task}\x00{text}".encode("utf-8")).hexdigest()
+
+def encode_vector(vector):
+    return array("f", vector).tobytes()
+
+def decode_vector(blob):
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+class EmbeddingCache:
+    """Embedding vectors stored as float32 blobs in a SQLiteCache."""
+
+    def __init__(self, path=None, max_entries=None, model=None):
+        self.model = model or embedding_providers.model_name()
+        self.store = SQLiteCache(
+            path or config.EMBEDDING_CACHE_PATH,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES if max_entries is None else max_entries,
+            table="embeddings"
+        )
+
+    def embed(self, texts, embed_fn, task="document"):
+        """Returns vectors for `texts`, calling `embed_fn` only for the cache misses."""
+        texts = list(texts)
+        keys = [cache_key(self.model, task, t) for t in texts]
+        found = self.store.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        tracing.count("embedding_cache_hits", len(keys) - len(missing))
+        tracing.count("embedding_cache_misses", len(missing))
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            new_items = {key: encode_vector(v) for key, v in zip(missing, vectors)}
+            self.store.put_many(new_items)
+            found.update(new_items)
+        return [decode_vector(found[key]) for key in keys]
+
+    def stats(self):
+        return self.store.stats()
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that consults the on-disk cache before the provider."""
+
+    def __init__(self, inner, cache):
+        self.inner = inner
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        return self.cache.embed(texts, self.inner.embed_documents, task="document")
+
+    def embed_query(self, text):
+        return self.cache.embed([text], lambda t: [self.inner.embed_query(t[0])], task="query")[0]
+
+def get_cache():
+    """Shared cache from config, or None when EMBEDDING_CACHE_PATH is empty."""
+    if not config.EMBEDDING_CACHE_PATH:
+        return None
+    return EmbeddingCache()
@@ -0,0 +1,284 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from . import config
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class EmbeddingAPIError(Exception):
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"Embedding API error {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status_code in RETRYABLE_STATUS
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.fill_rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Takes `amount` tokens, waiting for them if needed, and returns how many
+        were taken: a single request larger than the whole bucket would never fit,
+        so it only takes a full bucket instead of blocking forever."""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return amount
+                wait = (amount - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+    def debit(self, amount):
+        """Charges `amount` after the fact (a negative amount refunds). The bucket may
+        go below zero, so later acquire() calls wait until the overdraft is refilled."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate - amount)
+            self.updated = now
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits; either may be disabled with None/0."""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def acquire(self, tokens=0):
+        """Waits for one request and `tokens` tokens; returns the tokens actually taken."""
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens and tokens:
+            return self.tokens.acquire(tokens)
+        return 0
+
+    def settle(self, reserved, used):
+        """Corrects a call once its actual token count is known; `reserved` is what
+        acquire() returned (it may be less than requested, see TokenBucket.acquire)."""
+        if self.tokens and used != reserved:
+            self.tokens.debit(used - reserved)
+
+_shared_limiters = {}
+_shared_limiters_lock = threading.Lock()
+
+def shared_rate_limiter(name, rpm=None, tpm=None):
+    """Process-wide RateLimiter for `name` (created with the first caller's limits),
+    so that every engine and worker thread talking to one provider shares its quota."""
+    with _shared_limiters_lock:
+        if name not in _shared_limiters:
+            _shared_limiters[name] = RateLimiter(rpm, tpm)
+        return _shared_limiters[name]
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) used for TPM budgeting."""
+    return max(1, len(text) // 4)
+
+class GoogleEmbeddingClient:
+    """Minimal client for the Gemini `batchEmbedContents` REST endpoint.
+
+    Talking to the REST API directly (instead of through GoogleGenerativeAIEmbeddings)
+    exposes HTTP status codes for retries and lets `EMBEDDING_API_BASE` point at a
+    local fake server (see src/evaluation/fake_embedding_server.py).
+    """
+
+    def __init__(self, model=None, api_key=None, base_url=None, timeout=60):
+        self.model = model or config.EMBEDDING_MODEL
+        self.api_key = api_key or config.GOOGLE_API_KEY
+        self.base_url = (base_url or config.EMBEDDING_API_BASE).rstrip("/")
+        self.timeout = timeout
+
+    def embed_batch(self, texts, task_type="RETRIEVAL_DOCUMENT"):
+        url = f"{self.base_url}/v1beta/{self.model}:batchEmbedContents?key={self.api_key}"
+        body = {
+            "requests": [
+                {
+                    "model": self.model,
+                    "content": {"parts": [{"text": text}]},
+                    "taskType": task_type
+                }
+                for text in texts
+            ]
+        }
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            raise EmbeddingAPIError(
+                e.code,
+                e.read().decode("utf-8", errors="replace")[:200],
+                float(retry_after) if retry_after else None
+            ) from e
+        except urllib.error.URLError as e:
+            # Connection resets and timeouts are treated like a 503.
+            raise EmbeddingAPIError(503, str(e.reason)) from e
+
+        return [item["values"] for item in payload["embeddings"]]
+
+class EmbeddingScheduler:
+    """Embeds texts in concurrent batches under provider rate limits.
+
+    Args:
+        embed_fn: Callable taking a list of texts and returning one vector per text.
+            Raise EmbeddingAPIError to signal HTTP failures.
+        batch_size: Texts per API call.
+        concurrency: Number of batches in flight.
+        rpm / tpm: Provider requests- and tokens-per-minute limits.
+        max_retries: Attempts per batch for 429 and 5xx errors.
+    """
+
+    def __init__(self, embed_fn, batch_size=None, concurrency=None, rpm=None, tpm=None,
+                 max_retries=None, report_every=5.0):
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size or config.EMBED_BATCH_SIZE
+        self.concurrency = concurrency or config.EMBED_CONCURRENCY
+        self.limiter = RateLimiter(
+            config.EMBED_RPM if rpm is None else rpm,
+            config.EMBED_TPM if tpm is None else tpm
+        )
+        self.max_retries = config.EMBED_MAX_RETRIES if max_retries is None else max_retries
+        self.report_every = report_every
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"chunks": 0, "batches": 0, "retries": 0, "seconds": 0.0}
+
+    def _embed_with_retry(self, texts):
+        tokens = sum(estimate_tokens(t) for t in texts)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                vectors = self.embed_fn(texts)
+            except EmbeddingAPIError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    raise
+                delay = e.retry_after or min(60.0, (2 ** attempt) + random.uniform(0, 1))
+                with self.lock:
+                    self.stats["retries"] += 1
+                print(f"Embedding batch failed ({e.status_code}); retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                continue
+            if len(vectors) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(vectors)}.")
+            return vectors
+
+    def _report(self, done, total, started):
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        progress = f"{done}/{total}" if total else f"{done}"
+        print(f"Embedded {progress} chunks ({rate:.1f} chunks/s)")
+
+    def embed_stream(self, batches, cache=None, total=None):
+        """Embeds a stream of batches while the caller is still producing them.
+
+        Args:
+            batches: Iterable of (payload, texts) pairs, consumed lazily.
+            cache: Optional EmbeddingCache consulted before calling the provider.
+            total: Expected number of texts, only used for progress output.
+
+        Yields:
+            (payload, vectors) pairs in input order. At most `concurrency * 2`
+            batches are in flight (and `concurrency * 8` held in total), so a slow
+            provider applies backpressure to the producer instead of letting
+            parsed chunks pile up in memory.
+        """
+        embed_fn = self._embed_with_retry
+        if cache is not None:
+            embed_fn = lambda texts: cache.embed(texts, self._embed_with_retry)
+
+        max_in_flight = self.concurrency * 2
+        max_buffered = self.concurrency * 8
+        started = time.monotonic()
+        last_report = started
+        done = 0
+        in_flight = deque()
+
+        def collect():
+            nonlocal done, last_report
+            payload, texts, future = in_flight.popleft()
+            vectors = future.result()
+            done += len(texts)
+            with self.lock:
+                self.stats["chunks"] += len(texts)
+                self.stats["batches"] += 1
+            now = time.monotonic()
+            if now - last_report >= self.report_every:
+                self._report(done, total, started)
+                last_report = now
+            return payload, vectors
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for payload, texts in batches:
+                in_flight.append((payload, texts, pool.submit(embed_fn, list(texts))))
+                while in_flight and in_flight[0][2].done():
+                    yield collect()
+                # A batch stuck in retries must not stall the others, so finished
+                # batches may queue up behind it, but only up to `max_buffered`.
+                while len(in_flight) >= max_buffered:
+                    yield collect()
+                pending = [f for _, _, f in in_flight if not f.done()]
+                if len(pending) >= max_in_flight:
+                    wait(pending, return_when=FIRST_COMPLETED)
+            while in_flight:
+                yield collect()
+
+        if done:
+            self._report(done, total, started)
+        with self.lock:
+            self.stats["seconds"] += time.monotonic() - started
+
+    def embed(self, texts, cache=None):
+        """Returns embeddings for `texts` in input order."""
+        texts = list(texts)
+        batches = (
+            (None, texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        )
+        return [
+            vector
+            for _, vectors in self.embed_stream(batches, cache=cache, total=len(texts))
+            for vector in vectors
+        ]
+
+def get_scheduler(provider=None):
+    """Scheduler for the embedding provider (default EMBEDDING_PROVIDER).
+
+    "google" goes through the REST endpoint configured in config.py; "local" runs
+    the sentence-transformers model one batch at a time (it already uses every
+    core) without API rate limits.
+    """
+    provider = provider or config.EMBEDDING_PROVIDER
+    if provider == "local":
+        from .embedding_providers import LocalEmbeddings
+        model = LocalEmbeddings()
+        return EmbeddingScheduler(model.embed_documents, concurrency=1, rpm=0, tpm=0)
+    if provider != "google":
+        raise ValueError(f"Unknown embedding provider '{provider}'.")
+    if not config.GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+    client = GoogleEmbeddingClient()
+    return EmbeddingScheduler(client.embed_batch)
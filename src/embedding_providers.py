@@ -0,0 +1,102 @@
+import functools
+from langchain_core.embeddings import Embeddings
+from . import config
+
+PROVIDERS = ("google", "local")
+LOCAL_BACKENDS = ("torch", "onnx")
+
+def model_name(provider=None):
+    """Model of a provider (default EMBEDDING_PROVIDER), as recorded in store.json and cache keys."""
+    provider = provider or config.EMBEDDING_PROVIDER
+    if provider == "google":
+        return config.EMBEDDING_MODEL
+    if provider == "local":
+        return config.LOCAL_EMBEDDING_MODEL
+    raise ValueError(f"Unknown embedding provider '{provider}'. Choose one of: {', '.join(PROVIDERS)}.")
+
+@functools.lru_cache(maxsize=None)
+def load_sentence_transformer(model_name, backend):
+    """SentenceTransformer on CPU, loaded once per process; "onnx" runs it in ONNX
+    Runtime (needs sentence-transformers >= 3.2 with the onnx extra installed)."""
+    from sentence_transformers import SentenceTransformer
+    if backend == "onnx":
+        try:
+            return SentenceTransformer(model_name, device="cpu", backend="onnx")
+        except TypeError as e:
+            raise ValueError(
+                "The onnx embedding backend needs sentence-transformers>=3.2: "
+                "pip install 'sentence-transformers[onnx]'"
+            ) from e
+    return SentenceTransformer(model_name, device="cpu")
+
+class LocalEmbeddings(Embeddings):
+    """Sentence-transformers embeddings computed on CPU in batches.
+
+    The default multilingual E5 model handles Indonesian well; E5 models expect
+    "query: " / "passage: " prefixes, which are added automatically. Vectors are
+    L2-normalized, so the FAISS L2 distance ranks like cosine similarity.
+    """
+
+    def __init__(self, model_name=None, backend=None, batch_size=None):
+        self.model_name = model_name or config.LOCAL_EMBEDDING_MODEL
+        self.backend = backend or config.LOCAL_EMBEDDING_BACKEND
+        if self.backend not in LOCAL_BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{self.backend}'. Choose one of: {', '.join(LOCAL_BACKENDS)}.")
+        self.batch_size = batch_size or config.LOCAL_EMBEDDING_BATCH_SIZE
+        self.model = load_sentence_transformer(self.model_name, self.backend)
+        e5 = "e5" in self.model_name.lower()
+        self.query_prefix = "query: " if e5 else ""
+        self.document_prefix = "passage: " if e5 else ""
+
+    @property
+    def dim(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def _encode(self, texts):
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts, task_type=None):
+        # task_type mirrors GoogleGenerativeAIEmbeddings, so batched queries
+        # (see batcher._embed_queries) get the query prefix.
+        prefix = self.query_prefix if task_type and "query" in task_type else self.document_prefix
+        return self._encode([prefix + t for t in texts])
+
+    def embed_query(self, text):
+        return self._encode([self.query_prefix + text])[0]
+
+def get_embeddings(provider=None):
+    """Query-time Embeddings of a provider (default EMBEDDING_PROVIDER)."""
+    provider = provider or config.EMBEDDING_PROVIDER
+    if provider == "local":
+        return LocalEmbeddings()
+    if provider == "google":
+        if not config.GOOGLE_API_KEY:
+            raise ValueError("GOOGLE_API_KEY not set.")
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=config.EMBEDDING_MODEL, google_api_key=config.GOOGLE_API_KEY)
+    raise ValueError(f"Unknown embedding provider '{provider}'. Choose one of: {', '.join(PROVIDERS)}.")
+
+def check_index(info, embeddings=None, provider=None, path=None):
+    """Raises ValueError unless the index described by `info` (its store.json) was
+    built by `provider` (default EMBEDDING_PROVIDER) with the same model and, when
+    `embeddings` knows it, the same dimension."""
+    provider = provider or config.EMBEDDING_PROVIDER
+    built_provider = info.get("embedding_provider", "google")  # indexes from before providers existed
+    built_model = info.get("embedding_model")
+    expected_model = model_name(provider)
+    where = f"Index at {path}" if path else "Index"
+    if built_provider != provider or (built_model and built_model != expected_model):
+        raise ValueError(
+            f"{where} was built with {built_provider} embeddings ({built_model}), but EMBEDDING_PROVIDER is "
+            f"{provider} ({expected_model}). Rebuild it with `python main.py --reindex` or switch the provider back."
+        )
+    dim = getattr(embeddings, "dim", None)
+    if dim is not None and info.get("dim") not in (None, dim):
+        raise ValueError(f"{where} has {info['dim']}-dimensional vectors but {expected_model} produces {dim}.")
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up TWO levels to reach project root (src/evaluation -> src -> root)
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+import faiss
+import numpy as np
+from src import ann, config
+from src.vector_store import VectorStore
+
+def make_queries(vectors, num_queries, noise, seed=0):
+    """Perturbed copies of stored vectors, so no query is an exact match of a chunk."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+    queries = np.asarray(vectors[np.sort(rows)], dtype="float32")
+    scale = noise * float(np.linalg.norm(queries, axis=1).mean()) / np.sqrt(queries.shape[1])
+    return queries + rng.normal(0, scale, queries.shape).astype("float32")
+
+def index_size(index):
+    """Bytes of the serialized index (what index.faiss takes on disk). Not resident
+    memory: a memory-mapped index only pulls in the pages a search touches."""
+    return faiss.serialize_index(index).nbytes
+
+def measure(index, queries, truth, k, params):
+    latencies = []
+    hits = 0
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, rows = index.search(query[None, :], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(rows[0].tolist()) & set(truth[i].tolist()))
+    latencies = np.array(latencies)
+    return {
+        "recall": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+def run_benchmark(index_path, index_types, k, num_queries, noise, nprobes, ef_searches):
+    store = VectorStore.load(index_path)
+    vectors = store.vectors
+    print(f"Index at {index_path}: {len(store)} vectors, dim {store.info['dim']}")
+    queries = make_queries(vectors, num_queries, noise)
+
+    print("Computing exact (flat) ground truth...")
+    flat, _ = ann.build_from_vectors(vectors, "flat")
+    _, truth = flat.search(queries, k)
+
+    results = []
+    header = f"{'type':>9} {'setting':>12} {'recall@' + str(k):>10} {'p50 ms':>8} {'p99 ms':>8} {'index MB':>8} {'build s':>8}"
+    print("\n" + header)
+    for index_type in index_types:
+        start = time.perf_counter()
+        index, description = ann.build_from_vectors(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+        size = index_size(index)
+
+        if isinstance(index, faiss.IndexIVF):
+            settings = [(f"nprobe={n}", ann.search_parameters(index, nprobe=n)) for n in nprobes]
+        elif isinstance(index, faiss.IndexHNSW):
+            settings = [(f"efSearch={e}", ann.search_parameters(index, ef_search=e)) for e in ef_searches]
+        else:
+            settings = [("-", None)]
+
+        for label, params in settings:
+            row = measure(index, queries, truth, k, params)
+            row.update({
+                "index_type": index_type,
+                "factory": description,
+                "setting": label,
+                "index_bytes": size,
+                "build_seconds": build_seconds
+            })
+            results.append(row)
+            print(f"{index_type:>9} {label:>12} {row['recall']:>10.3f} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} "
+                  f"{size / 1e6:>8.2f} {build_seconds:>8.2f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall/latency/size benchmark of FAISS index types")
+    parser.add_argument("--index-path", default=config.INDEX_PATH)
+    parser.add_argument("--types", default=",".join(ann.INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=15, help="Matches top_k_initial of hop 2")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.1, help="Relative noise added to sampled query vectors")
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--ef-search", default="16,64,256")
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.index_path,
+        args.types.split(","),
+        args.k,
+        args.queries,
+        args.noise,
+        [int(n) for n in args.nprobe.split(",")],
+        [int(e) for e in args.ef_search.split(",")]
+    )
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
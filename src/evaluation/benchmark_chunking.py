@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up TWO levels to reach project root (src/evaluation -> src -> root)
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from langchain_core.documents import Document
+from src import chunking, ingestion
+
+def make_corpus(base_docs, size):
+    """Replicates the sample articles (with unique links) up to `size` articles."""
+    docs = []
+    for i in range(size):
+        doc = base_docs[i % len(base_docs)]
+        metadata = dict(doc.metadata, link=f"{doc.metadata.get('link', '')}#copy-{i}")
+        docs.append(Document(page_content=doc.page_content, metadata=metadata))
+    return docs
+
+def serial_baseline(docs):
+    """The pre-existing path: RecursiveCharacterTextSplitter.split_documents per article."""
+    splitter = chunking.get_splitter()
+    return [[c.page_content for c in splitter.split_documents([doc])] for doc in docs]
+
+def run_split(docs, workers):
+    articles = ((i, doc) for i, doc in enumerate(docs))
+    return [texts for _, _, texts in chunking.iter_split(articles, workers=workers)]
+
+def run_benchmark(sizes, worker_counts, repeats):
+    print("Loading sample articles...")
+    base_docs = ingestion.load_data()
+    results = []
+
+    print(f"\n{'articles':>9} {'mode':>10} {'chunks':>8} {'seconds':>9} {'speedup':>8}")
+    for size in sizes:
+        docs = make_corpus(base_docs, size)
+
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            expected = serial_baseline(docs)
+            timings.append(time.perf_counter() - start)
+        baseline = min(timings)
+        chunks = sum(len(t) for t in expected)
+        print(f"{size:>9} {'serial':>10} {chunks:>8} {baseline:>9.3f} {1.0:>8.2f}")
+        results.append({"articles": size, "workers": 1, "chunks": chunks, "seconds": baseline})
+
+        for workers in worker_counts:
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                output = run_split(docs, workers)
+                timings.append(time.perf_counter() - start)
+            if output != expected:
+                raise AssertionError(f"Parallel output with {workers} workers differs from the serial path.")
+            best = min(timings)
+            print(f"{size:>9} {f'{workers} procs':>10} {chunks:>8} {best:>9.3f} {baseline / best:>8.2f}")
+            results.append({"articles": size, "workers": workers, "chunks": chunks, "seconds": best})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial vs process-pool chunking benchmark")
+    parser.add_argument("--sizes", default="500,2000,8000", help="Comma-separated corpus sizes (articles)")
+    parser.add_argument("--workers", default=f"2,4,{os.cpu_count() or 1}", help="Comma-separated process counts")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    worker_counts = sorted({int(w) for w in args.workers.split(",") if int(w) > 1})
+    results = run_benchmark(sizes, worker_counts, args.repeats)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
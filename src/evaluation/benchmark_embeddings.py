@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up TWO levels to reach project root (src/evaluation -> src -> root)
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+import numpy as np
+from src import config
+from src.embedding_providers import LocalEmbeddings, get_embeddings
+
+def load_corpus(max_chunks):
+    """(texts, titles, store) of the indexed chunks, or of freshly chunked sample data without an index."""
+    from src.vector_store import VectorStore, index_exists
+    if index_exists():
+        store = VectorStore.load(config.INDEX_PATH)
+        rows = range(min(len(store), max_chunks))
+        print(f"Using {len(rows)} chunks from the index at {config.INDEX_PATH}")
+        return ([store.chunks.value("text", r) for r in rows],
+                [store.chunks.value("title", r) or "" for r in rows], store)
+
+    from src import chunking, ingestion
+    print("No index found; chunking the sample data...")
+    texts, titles = [], []
+    articles = ((None, doc) for doc in ingestion.load_data())
+    for _, doc, chunk_texts in chunking.iter_split(articles):
+        texts += chunk_texts
+        titles += [doc.metadata.get("title", "")] * len(chunk_texts)
+    return texts[:max_chunks], titles[:max_chunks], None
+
+def corpus_vectors(name, embeddings, texts, store):
+    """Corpus embeddings and seconds spent; stored index vectors are reused when they match."""
+    info = store.info if store is not None else {}
+    built_with = (info.get("embedding_provider", "google"), info.get("embedding_model"))
+    if store is not None and built_with == name:
+        print(f"  reusing the index vectors ({built_with[1]})")
+        return np.asarray(store.vectors[:len(texts)], dtype="float32"), None
+    start = time.perf_counter()
+    if name[0] == "google":
+        from src.embedding_cache import EmbeddingCache
+        from src.embedding_pipeline import get_scheduler
+        cache = EmbeddingCache(model=config.EMBEDDING_MODEL) if config.EMBEDDING_CACHE_PATH else None
+        vectors = get_scheduler("google").embed(texts, cache=cache)
+    else:
+        vectors = embeddings.embed_documents(texts)
+    return np.asarray(vectors, dtype="float32"), time.perf_counter() - start
+
+def top_k(doc_vectors, query_vectors, k):
+    docs = doc_vectors / (np.linalg.norm(doc_vectors, axis=1, keepdims=True) + 1e-12)
+    queries = query_vectors / (np.linalg.norm(query_vectors, axis=1, keepdims=True) + 1e-12)
+    scores = queries @ docs.T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+def title_rank(rows, titles, target):
+    for rank, row in enumerate(rows, start=1):
+        if target in titles[row].lower():
+            return rank
+    return 0
+
+def run_benchmark(dataset, texts, titles, store, configs, k):
+    queries = [item['question'] for item in dataset]
+    targets = [item['expected_document_title'].lower() for item in dataset]
+    results = []
+    reference_rows = None
+    for provider, model_name, backend in configs:
+        label = provider if provider == "google" else f"{provider}:{model_name}:{backend}"
+        print(f"\n--- {label} ---")
+        try:
+            start = time.perf_counter()
+            if provider == "google":
+                embeddings = get_embeddings("google")
+            else:
+                embeddings = LocalEmbeddings(model_name, backend)
+            load_seconds = time.perf_counter() - start
+            doc_vectors, embed_seconds = corpus_vectors(
+                (provider, model_name), embeddings, texts, store
+            )
+        except Exception as e:
+            print(f"  skipped: {e}")
+            continue
+
+        embeddings.embed_query(queries[0])  # warm-up
+        latencies = []
+        query_vectors = []
+        for q in queries:
+            start = time.perf_counter()
+            query_vectors.append(embeddings.embed_query(q))
+            latencies.append((time.perf_counter() - start) * 1000)
+        rows = top_k(doc_vectors, np.asarray(query_vectors, dtype="float32"), k)
+        ranks = [title_rank(r, titles, t) for r, t in zip(rows, targets)]
+        if reference_rows is None:
+            reference_rows = rows
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(rows, reference_rows)])
+
+        row = {
+            "provider": provider,
+            "model": model_name,
+            "backend": backend,
+            "dim": int(doc_vectors.shape[1]),
+            "load_seconds": load_seconds,
+            "corpus_chunks_per_s": len(texts) / embed_seconds if embed_seconds else None,
+            "query_p50_ms": float(np.percentile(latencies, 50)),
+            "query_p95_ms": float(np.percentile(latencies, 95)),
+            "hit@1": sum(1 for r in ranks if r == 1) / len(ranks),
+            f"hit@{k}": sum(1 for r in ranks if r) / len(ranks),
+            "mrr": sum(1.0 / r for r in ranks if r) / len(ranks),
+            f"top{k}_overlap_with_first": float(overlap)
+        }
+        results.append(row)
+        rate = f"{row['corpus_chunks_per_s']:.1f}" if row["corpus_chunks_per_s"] else "-"
+        print(f"  dim {row['dim']} | corpus {rate} chunks/s | query p50 {row['query_p50_ms']:.1f}ms "
+              f"p95 {row['query_p95_ms']:.1f}ms | hit@1 {row['hit@1']:.2f} hit@{k} {row[f'hit@{k}']:.2f} "
+              f"MRR {row['mrr']:.3f} | top{k} overlap {overlap:.2f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding provider latency and recall comparison")
+    parser.add_argument("--providers", default="google,local",
+                        help="Comma-separated; the first one is the reference for top-k overlap")
+    parser.add_argument("--local-models", default=config.LOCAL_EMBEDDING_MODEL)
+    parser.add_argument("--backends", default="torch,onnx", help="Local backends to try")
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--max-chunks", type=int, default=20000)
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    with open(os.path.join(root_dir, 'data', 'eval_datasets', 'evaluation_dataset.json'), 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    texts, titles, store = load_corpus(args.max_chunks)
+
+    configs = []
+    for provider in args.providers.split(","):
+        if provider == "google":
+            configs.append(("google", config.EMBEDDING_MODEL, None))
+        else:
+            configs += [(provider, m, b) for m in args.local_models.split(",") for b in args.backends.split(",")]
+    results = run_benchmark(dataset, texts, titles, store, configs, args.k)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up TWO levels to reach project root (src/evaluation -> src -> root)
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+import numpy as np
+from src import config, offline
+from src.evaluation.evaluate_retrieval import calculate_mrr, find_rank
+from src.rag_engine import RAGEngine
+
+HIT_KS = (1, 3, 5, 8)
+STAGES = ("hop1", "route", "reformulate", "hop2_retrieval", "diversify", "rerank", "generate")
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def make_engine(args):
+    """RAGEngine on the offline index with local stand-ins, caches off so every run does the full work."""
+    embeddings = offline.HashingEmbeddings(args.dim)
+    if args.rebuild or not offline.index_is_current(embeddings):
+        print(f"Building offline index at {config.OFFLINE_INDEX_PATH}...")
+        start = time.perf_counter()
+        info = offline.build_index(embeddings, index_type=args.index_type)
+        print(f"Indexed {info['count']} chunks in {time.perf_counter() - start:.1f}s")
+
+    reformulations = {}
+    if args.reformulations:
+        with open(args.reformulations, 'r', encoding='utf-8') as f:
+            reformulations = json.load(f)
+    reranker = offline.LexicalReranker() if args.reranker == "lexical" else None
+    # Cross-encoder thresholds mean nothing for lexical scores, so routing is off by default then.
+    router = args.router or ("off" if args.reranker == "lexical" else config.HOP_ROUTER)
+    engine = RAGEngine(
+        hop1_mode=args.hop1, hop2_mode=args.hop2, router=router, batching=False,
+        llm=offline.canned_llm(reformulations), embeddings=embeddings, reranker=reranker,
+        index_path=config.OFFLINE_INDEX_PATH
+    )
+    if engine.vectorstore is None:
+        raise SystemExit("Offline index could not be loaded.")
+    engine.warmup()
+    engine.answer_cache = None
+    engine.reformulation_cache = None
+    return engine
+
+def run_query(engine, question, full, top_k_initial=15, top_k_final=8):
+    """The _retrieve / process_query stages one by one, timed separately."""
+    timings = {}
+    start = time.perf_counter()
+    initial_docs = engine.initial_retrieval(question)
+    timings["hop1"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    confidence = engine.hop1_confidence(question, initial_docs)
+    skip = engine.should_skip_reformulation(confidence)
+    timings["route"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_query = question if skip else engine.reformulate_query(question, initial_docs)
+    timings["reformulate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    candidates = engine.hop2_search(new_query, top_k_initial)
+    timings["hop2_retrieval"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    candidates = engine.diversify(candidates)
+    timings["diversify"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    final_docs = engine.rerank(new_query, candidates, top_k_final)
+    timings["rerank"] = time.perf_counter() - start
+
+    if full:
+        start = time.perf_counter()
+        engine.generate_answer(question, final_docs)
+        timings["generate"] = time.perf_counter() - start
+    timings["total"] = sum(timings.values())
+    return new_query, "direct" if skip else "double_hop", final_docs, len(candidates), timings
+
+def run_mode(engine, dataset, full, repeats):
+    name = "full" if full else "retrieval"
+    diversified = ", diversified candidates" if engine.diversify_candidates else ""
+    print(f"\n--- {name} pipeline{diversified} on {len(dataset)} questions (x{repeats}) ---")
+    run_query(engine, dataset[0]['question'], full)  # warm-up: maps the index files
+    queries = []
+    latencies = {}
+    for _ in range(repeats):
+        queries = []
+        for item in dataset:
+            new_query, path, final_docs, reranked, timings = run_query(engine, item['question'], full)
+            rank = find_rank(final_docs, item['expected_document_title'].lower())
+            queries.append({
+                "question": item['question'],
+                "reformulated_query": new_query,
+                "path": path,
+                "rank": rank,
+                "reranked": reranked,
+                "articles": len({d.metadata.get("link") for d in final_docs}),
+                "seconds": timings
+            })
+            for stage, seconds in timings.items():
+                latencies.setdefault(stage, []).append(seconds * 1000)
+
+    total = len(queries)
+    metrics = {f"hit@{k}": sum(1 for q in queries if 0 < q["rank"] <= k) / total for k in HIT_KS}
+    metrics["mrr"] = sum(calculate_mrr(q["rank"]) for q in queries) / total
+    reranked = sum(q["reranked"] for q in queries) / total
+    articles = sum(q["articles"] for q in queries) / total
+    latency_ms = {
+        stage: {
+            "mean": float(np.mean(values)),
+            "p50": float(np.percentile(values, 50)),
+            "p95": float(np.percentile(values, 95))
+        }
+        for stage, values in latencies.items()
+    }
+
+    print("  " + " | ".join(f"{key} {value:.3f}" for key, value in metrics.items()))
+    print(f"  {reranked:.1f} chunks reranked and {articles:.1f} distinct articles in the final docs per query")
+    print(f"  {'stage':>15} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for stage in STAGES + ("total",):
+        if stage in latency_ms:
+            s = latency_ms[stage]
+            print(f"  {stage:>15} {s['mean']:>9.2f} {s['p50']:>9.2f} {s['p95']:>9.2f}")
+    return {
+        "metrics": metrics,
+        "latency_ms": latency_ms,
+        "reranked_per_query": reranked,
+        "articles_per_query": articles,
+        "queries": queries
+    }
+
+def print_diversity_effect(plain, diversified):
+    """Reranker time saved and ranking change of MMR candidate selection."""
+    saved = plain["latency_ms"]["rerank"]["mean"] - diversified["latency_ms"]["rerank"]["mean"]
+    overhead = diversified["latency_ms"]["diversify"]["mean"]
+    print(f"  MMR: {plain['reranked_per_query']:.1f} -> {diversified['reranked_per_query']:.1f} chunks reranked, "
+          f"rerank {saved:.2f}ms/query saved for {overhead:.2f}ms of selection, "
+          f"{plain['articles_per_query']:.1f} -> {diversified['articles_per_query']:.1f} articles in the final docs")
+    print("  " + " | ".join(
+        f"{key} {diversified['metrics'][key] - value:+.3f}" for key, value in plain["metrics"].items()
+    ))
+
+def compare(results, baseline, max_slowdown, max_recall_drop):
+    """Regressions of `results` against a saved baseline (an empty list when there are none)."""
+    regressions = []
+    for name, run in results["runs"].items():
+        base = baseline.get("runs", {}).get(name)
+        if base is None:
+            continue
+        for key, value in run["metrics"].items():
+            old = base["metrics"].get(key)
+            if old is not None and value < old - max_recall_drop:
+                regressions.append(f"{name} {key}: {old:.3f} -> {value:.3f}")
+        old = base["latency_ms"]["total"]["p50"]
+        new = run["latency_ms"]["total"]["p50"]
+        if new > old * max_slowdown:
+            regressions.append(f"{name} p50 latency: {old:.2f}ms -> {new:.2f}ms (limit x{max_slowdown})")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline retrieval/pipeline benchmark with deterministic local stand-ins (no API keys needed)"
+    )
+    parser.add_argument("--mode", choices=["retrieval", "full", "both"], default="both")
+    parser.add_argument("--hop1", default=config.HOP1_RETRIEVAL, help="dense, bm25 or hybrid")
+    parser.add_argument("--hop2", default=config.HOP2_RETRIEVAL, help="dense, bm25 or hybrid")
+    parser.add_argument("--reranker", choices=["lexical", "model"], default="lexical",
+                        help="'model' uses the local cross-encoder (RERANKER_MODEL must be downloaded)")
+    parser.add_argument("--router", choices=["rerank", "similarity", "off"],
+                        help="Default: off with the lexical reranker, HOP_ROUTER with the model")
+    parser.add_argument("--reformulations", help="JSON {question: reformulated query} for the canned LLM")
+    parser.add_argument("--dim", type=int, default=config.OFFLINE_EMBEDDING_DIM)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the offline index")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join(root_dir, 'offline_eval.json'))
+    parser.add_argument("--diversify", choices=["on", "off", "both"],
+                        default="on" if config.DIVERSIFY_CANDIDATES else "off",
+                        help="MMR candidate selection before the rerank; 'both' compares the two "
+                             "(runs with it on are saved as <mode>_mmr)")
+    parser.add_argument("--baseline", help="Earlier --output file to check for regressions (exit code 1)")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, help="Allowed p50 latency ratio")
+    parser.add_argument("--max-recall-drop", type=float, default=0.0, help="Allowed drop in hit@k / MRR")
+    args = parser.parse_args()
+
+    dataset = load_json(os.path.join(root_dir, 'data', 'eval_datasets', 'evaluation_dataset.json'))
+    engine = make_engine(args)
+
+    results = {
+        "settings": {
+            "hop1": engine.hop1_mode,
+            "hop2": engine.hop2_mode,
+            "router": engine.router,
+            "reranker": args.reranker,
+            "embeddings": engine.embeddings.model,
+            "index_type": args.index_type,
+            "chunks": len(engine.vectorstore),
+            "repeats": args.repeats
+        },
+        "runs": {}
+    }
+    modes = ["retrieval", "full"] if args.mode == "both" else [args.mode]
+    settings = [False, True] if args.diversify == "both" else [args.diversify == "on"]
+    for mode in modes:
+        for diversify in settings:
+            engine.diversify_candidates = diversify
+            name = f"{mode}_mmr" if diversify else mode
+            results["runs"][name] = run_mode(engine, dataset, mode == "full", args.repeats)
+        if args.diversify == "both":
+            print_diversity_effect(results["runs"][mode], results["runs"][f"{mode}_mmr"])
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, load_json(args.baseline), args.max_slowdown, args.max_recall_drop)
+        if regressions:
+            print("REGRESSIONS against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
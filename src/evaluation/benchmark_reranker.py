@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up TWO levels to reach project root (src/evaluation -> src -> root)
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+import numpy as np
+from src import config
+from src.reranker import BACKENDS, load_cross_encoder
+
+def load_queries(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [item['question'] for item in json.load(f)]
+
+def candidate_sets(queries, k, seed=0):
+    """Hop-2-sized candidate lists per query: BM25 hits from the index when one
+    exists (no network needed), otherwise random chunks of the sample data."""
+    from src.vector_store import VectorStore, index_exists
+    if index_exists():
+        store = VectorStore.load(config.INDEX_PATH)
+        if store.bm25 is not None:
+            print("Using BM25 candidates from the index...")
+            sets = []
+            for q in queries:
+                rows, _ = store.bm25.search(q, k)
+                rows = list(rows) or list(range(min(k, len(store))))
+                sets.append([store.chunks.value("text", int(r)) for r in rows])
+            return sets
+
+    print("No index found; using random chunks from the sample data...")
+    from src import chunking, ingestion
+    splitter = chunking.get_splitter()
+    chunks = [c for doc in ingestion.load_data() for c in splitter.split_text(doc.page_content)]
+    rng = random.Random(seed)
+    return [rng.sample(chunks, min(k, len(chunks))) for _ in queries]
+
+def ranks(scores):
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    result = np.empty(len(order))
+    result[order] = np.arange(len(order))
+    return result
+
+def agreement(reference, scores, top_k):
+    if len(reference) < 2:
+        return 1.0, 1.0, 1.0
+    ref_ranks, ranks_ = ranks(reference), ranks(scores)
+    spearman = float(np.corrcoef(ref_ranks, ranks_)[0, 1])
+    ref_top = set(np.argsort(-np.asarray(reference), kind="stable")[:top_k])
+    top = set(np.argsort(-np.asarray(scores), kind="stable")[:top_k])
+    return spearman, len(ref_top & top) / len(ref_top), float(np.argmax(reference) == np.argmax(scores))
+
+def run_benchmark(queries, sets, configs, batch_size, repeats, top_k):
+    print("\nReference: torch backend, max_length 512 (the previous default)")
+    reference_model = load_cross_encoder(config.RERANKER_MODEL, "torch", 512)
+    reference = [reference_model.predict([[q, t] for t in texts], batch_size=batch_size, show_progress_bar=False)
+                 for q, texts in zip(queries, sets)]
+    del reference_model
+
+    results = []
+    print(f"\n{'backend':>8} {'max_len':>8} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'spearman':>9} {f'top{top_k}':>6} {'top1':>6}")
+    for backend, max_length in configs:
+        start = time.perf_counter()
+        try:
+            model = load_cross_encoder(config.RERANKER_MODEL, backend, max_length)
+        except Exception as e:
+            print(f"{backend:>8} {max_length:>8}  skipped: {e}")
+            continue
+        load_seconds = time.perf_counter() - start
+
+        pairs = [[[q, t] for t in texts] for q, texts in zip(queries, sets)]
+        model.predict(pairs[0], batch_size=batch_size, show_progress_bar=False)  # warm-up
+        latencies = []
+        scores = []
+        for _ in range(repeats):
+            scores = []
+            for query_pairs in pairs:
+                start = time.perf_counter()
+                scores.append(model.predict(query_pairs, batch_size=batch_size, show_progress_bar=False))
+                latencies.append((time.perf_counter() - start) * 1000)
+        stats = np.array([agreement(r, s, top_k) for r, s in zip(reference, scores)]).mean(axis=0)
+
+        row = {
+            "backend": backend,
+            "max_length": max_length,
+            "batch_size": batch_size,
+            "load_seconds": load_seconds,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "spearman": float(stats[0]),
+            f"top{top_k}_overlap": float(stats[1]),
+            "top1_agreement": float(stats[2])
+        }
+        results.append(row)
+        print(f"{backend:>8} {max_length:>8} {load_seconds:>7.2f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['spearman']:>9.3f} {stats[1]:>6.2f} {stats[2]:>6.2f}")
+        del model
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-encoder reranker backend benchmark")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--max-lengths", default="512,384,256")
+    parser.add_argument("--batch-size", type=int, default=config.RERANKER_BATCH_SIZE)
+    parser.add_argument("--candidates", type=int, default=15, help="Pairs per query (hop-2 top_k_initial)")
+    parser.add_argument("--top-k", type=int, default=8, help="Kept after reranking (hop-2 top_k_final)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    queries = load_queries(os.path.join(root_dir, 'data', 'eval_datasets', 'evaluation_dataset.json'))
+    sets = candidate_sets(queries, args.candidates)
+    configs = [(b, int(m)) for b in args.backends.split(",") for m in args.max_lengths.split(",")]
+    results = run_benchmark(queries, sets, configs, args.batch_size, args.repeats, args.top_k)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up TWO levels to reach project root (src/evaluation -> src -> root)
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+# Imported one by one after src.rag_engine, so each time is that module's own
+# cost on top of what the engine module already pulled in.
+HEAVY_MODULES = (
+    "langchain_core.prompts",
+    "faiss",
+    "langchain_groq",
+    "langchain_google_genai",
+    "sentence_transformers"
+)
+
+def timed_import(name):
+    import importlib
+    start = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        return None
+    return time.perf_counter() - start
+
+def measure_imports():
+    """Seconds to import the CLI entry point, the engine module and each heavy dependency."""
+    timings = {}
+    for name in ("src.config", "main", "src.rag_engine") + HEAVY_MODULES:
+        timings[name] = timed_import(name)
+    return timings
+
+def measure_engine(offline, parallel, question):
+    """Seconds to import and construct a RAGEngine, warm it up and answer one question."""
+    timings = {}
+    start = time.perf_counter()
+    from src import config
+    from src.rag_engine import RAGEngine
+    timings["import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if offline:
+        from src import offline as stand_ins
+        engine = RAGEngine(
+            router="off", llm=stand_ins.canned_llm({}), embeddings=stand_ins.HashingEmbeddings(),
+            index_path=config.OFFLINE_INDEX_PATH
+        )
+    else:
+        engine = RAGEngine()
+    timings["construct"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for part, seconds in engine.warmup(parallel=parallel).items():
+        timings[f"warmup_{part}"] = seconds
+    timings["warmup"] = time.perf_counter() - start
+
+    if question:
+        engine.answer_cache = None
+        engine.reformulation_cache = None
+        start = time.perf_counter()
+        engine.process_query(question)
+        timings["first_query"] = time.perf_counter() - start
+    return timings
+
+def run_child(child, question=None):
+    """One measurement in a fresh interpreter, so nothing is imported or loaded yet."""
+    command = [sys.executable, os.path.abspath(__file__), "--child", child]
+    if question:
+        command += ["--question", question]
+    start = time.perf_counter()
+    output = subprocess.run(command, cwd=root_dir, capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+def median_timings(runs):
+    result = {}
+    for key in runs[0]:
+        values = sorted(r[key] for r in runs if r.get(key) is not None)
+        result[key] = values[len(values) // 2] if values else None
+    return result
+
+def print_timings(title, timings):
+    print(f"\n--- {title} ---")
+    for key, seconds in timings.items():
+        print(f"  {key:>28} " + (f"{seconds:8.3f}s" if seconds is not None else "     n/a"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cold-start breakdown: imports, engine construction, index and model loading"
+    )
+    parser.add_argument("--offline", action="store_true",
+                        help="Offline index with local stand-ins for the LLM and embeddings (no API keys)")
+    parser.add_argument("--question", help="Also time a first query after warmup")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh processes per measurement (median)")
+    parser.add_argument("--output", help="Optional path for JSON results")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        from src import utils
+        utils.setup_logging("WARNING")
+        mode, parallel, offline = args.child.split(":")
+        if mode == "imports":
+            timings = measure_imports()
+        else:
+            timings = measure_engine(offline == "1", parallel == "1", args.question)
+        print(json.dumps(timings))
+        sys.exit(0)
+
+    if args.offline:
+        from src import offline
+        embeddings = offline.HashingEmbeddings()
+        if not offline.index_is_current(embeddings):
+            print("Building offline index (not timed)...")
+            offline.build_index(embeddings)
+
+    offline_flag = "1" if args.offline else "0"
+    measurements = (
+        ("imports", "imports:0:0", None),
+        ("serial_warmup", f"engine:0:{offline_flag}", args.question),
+        ("parallel_warmup", f"engine:1:{offline_flag}", args.question)
+    )
+    results = {}
+    for name, child, question in measurements:
+        runs = [run_child(child, question) for _ in range(args.repeats)]
+        results[name] = median_timings(runs)
+        print_timings(f"{name} (median of {args.repeats})", results[name])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
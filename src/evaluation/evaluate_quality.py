@@ -1,7 +1,6 @@
 import os
 import sys
 import json
-import time
 import pandas as pd
 
 # Note: We must insert root into path to import modules correctly
@@ -12,7 +11,7 @@ if root_dir not in sys.path:
     sys.path.append(root_dir)
 
 from src.rag_engine import RAGEngine
-from src import config
+from src import config, utils
 
 def generate_evaluation_dataset():
     print("--- RAG Response Generation for Manual Review ---")
@@ -33,35 +32,29 @@ def generate_evaluation_dataset():
             contexts = data_dict['contexts']
     else:
         print("\n[GENERATOR] No cache found. Initializing RAG Engine to generate answers...")
-        engine = RAGEngine()
+        engine = RAGEngine(batching=True)
         
         raw_data_path = os.path.join(root_dir, 'data', 'eval_datasets', 'evaluation_dataset.json')
         with open(raw_data_path, 'r', encoding='utf-8') as f:
             raw_data = json.load(f)
             
-        print(f"Starting Generation Loop for {len(raw_data)} questions (with 5s safety delay)...")
+        print(f"Starting Generation for {len(raw_data)} questions "
+              f"({config.QUERY_CONCURRENCY} at a time, LLM calls paced by the {config.LLM_PROVIDER} rate limit)...")
         
-        for i, item in enumerate(raw_data):
-            q = item['question']
-            print(f"[{i+1}/{len(raw_data)}] Processing: {q[:40]}...")
-            
-            try:
-                result = engine.process_query(q)
-                
-                questions.append(q)
-                answers.append(result['answer'])
-                
-                ctx_texts = [doc.page_content for doc in result['final_docs']]
-                contexts.append(ctx_texts)
-                
-                time.sleep(5) 
-                
-            except Exception as e:
-                print(f"Error processing {q}: {e}")
-                questions.append(q)
+        checkpoint_file = os.path.join(root_dir, 'ragas_input.checkpoint.jsonl')
+        results = engine.process_queries([item['question'] for item in raw_data], checkpoint_path=checkpoint_file)
+        
+        for item, result in zip(raw_data, results):
+            questions.append(item['question'])
+            if "error" in result:
                 answers.append("Error generating answer.")
                 contexts.append(["Error retrieving context."])
+            else:
+                answers.append(result['answer'])
+                contexts.append([doc.page_content for doc in result['final_docs']])
         
+        if engine.reformulation_cache is not None:
+            print(f"\n[CACHE] Reformulation cache: {engine.reformulation_cache.stats()}")
         print(f"\n[CACHE] Saving generated answers to {cache_file}...")
         cache_data = {
             'question': questions,
@@ -102,4 +95,5 @@ def generate_evaluation_dataset():
     print(f"SUCCESS: Dataset saved to: {output_csv}")
 
 if __name__ == "__main__":
+    utils.setup_logging()
     generate_evaluation_dataset()
@@ -1,3 +1,4 @@
+import argparse
 import json
 import os
 import sys
@@ -12,6 +13,7 @@ root_dir = os.path.dirname(os.path.dirname(current_dir))
 if root_dir not in sys.path:
     sys.path.append(root_dir)
 
+from src import utils
 from src.rag_engine import RAGEngine
 
 def calculate_mrr(rank):
@@ -19,12 +21,22 @@ def calculate_mrr(rank):
         return 0
     return 1.0 / rank
 
-def run_evaluation(data_path):
+def find_rank(docs, target_doc):
+    """1-based rank of the first doc whose title or source contains `target_doc`, 0 if none."""
+    for rank, doc in enumerate(docs, start=1):
+        doc_title = doc.metadata.get('title', '').lower()
+        doc_source = doc.metadata.get('source', '').lower()
+        if target_doc in doc_title or target_doc in doc_source:
+            return rank
+    return 0
+
+def run_evaluation(data_path, concurrency=None, checkpoint_path=None):
     print(f"Loading evaluation set from: {data_path}")
     with open(data_path, 'r', encoding='utf-8') as f:
         eval_data = json.load(f)
     
-    engine = RAGEngine()
+    # Concurrent queries share reranker and query-embedding batches
+    engine = RAGEngine(batching=True)
     
     total_questions = len(eval_data)
     hits = 0
@@ -32,49 +44,32 @@ def run_evaluation(data_path):
     
     print(f"\n--- Starting Evaluation on {total_questions} Questions ---\n")
     
-    for i, item in enumerate(eval_data):
-        q = item['question']
+    start = time.perf_counter()
+    results = engine.process_queries(
+        [item['question'] for item in eval_data],
+        concurrency=concurrency, checkpoint_path=checkpoint_path, mode="retrieval"
+    )
+    elapsed = time.perf_counter() - start
+    
+    for item, result in zip(eval_data, results):
         target_doc = item['expected_document_title'].lower()
         
-        print(f"Query: {q}")
+        print(f"Query: {item['question']}")
+        if "error" in result:
+            print(f"  [ERROR] {result['error']}")
+            continue
+        print(f"  [Ref. Query] {result['reformulated_query']}")
         
-        try:
-            # 1. Hop 1: Context
-            initial_docs = engine.initial_retrieval(q)
-            
-            # 2. Reformulation (The Core Feature)
-            reformulated_query = engine.reformulate_query(q, initial_docs)
-            print(f"  [Ref. Query] {reformulated_query}")
-            
-            # 3. Hop 2: Precision Search using NEW Query
-            retrieved_docs = engine.final_retrieval_and_rerank(reformulated_query, top_k_initial=15, top_k_final=8)
-            
-            # Check for Hit
-            found_rank = 0 
-            
-            for rank, doc in enumerate(retrieved_docs, start=1):
-                doc_title = doc.metadata.get('title', '').lower()
-                doc_source = doc.metadata.get('source', '').lower()
-                
-                if target_doc in doc_title or target_doc in doc_source:
-                    found_rank = rank
-                    break
-            
-            if found_rank > 0:
-                print(f"  [HIT] Found at Rank {found_rank}")
-                hits += 1
-                mrr_sum += calculate_mrr(found_rank)
-            else:
-                print(f"  [MISS] Correct Doc '{target_doc}' not in top {len(retrieved_docs)}")
-                
-        except Exception as e:
-            print(f"  [ERROR] {e}")
-
-        # Rate Limit Pause (1m 30s)
-        if i < total_questions - 1:
-            print("  [Safety] Pausing 90s for API limits...", end='\r')
-            time.sleep(90)
-            print("  [Resume] Continuing...                        ")
+        # Check for Hit
+        retrieved_docs = result['final_docs']
+        found_rank = find_rank(retrieved_docs, target_doc)
+        
+        if found_rank > 0:
+            print(f"  [HIT] Found at Rank {found_rank}")
+            hits += 1
+            mrr_sum += calculate_mrr(found_rank)
+        else:
+            print(f"  [MISS] Correct Doc '{target_doc}' not in top {len(retrieved_docs)}")
 
     # Final Stats
     hit_rate = (hits / total_questions) * 100
@@ -84,13 +79,114 @@ def run_evaluation(data_path):
     print(f"Total Questions: {total_questions}")
     print(f"Hit Rate: {hit_rate:.1f}%")
     print(f"MRR Score: {mrr_score:.3f}")
+    print(f"Wall time: {elapsed:.1f}s")
+    if engine.reformulation_cache is not None:
+        print(f"Reformulation Cache: {engine.reformulation_cache.stats()}")
     print("===========================")
 
+def run_router_evaluation(data_path, router="rerank"):
+    """Compares the full double-hop pipeline with the confidence-routed one.
+
+    Every question runs hop 1, reformulation and hop 2 (the baseline). When the
+    router would skip reformulation, hop 2 is also run on the original query and
+    that result is what the routed pipeline returns; otherwise both are identical.
+    """
+    if router == "off":
+        raise ValueError("Router evaluation needs a scorer: use --router rerank or --router similarity.")
+    print(f"Loading evaluation set from: {data_path}")
+    with open(data_path, 'r', encoding='utf-8') as f:
+        eval_data = json.load(f)
+
+    engine = RAGEngine(router=router)
+    total_questions = len(eval_data)
+    totals = {
+        "baseline": {"hits": 0, "mrr": 0.0, "seconds": 0.0},
+        "routed": {"hits": 0, "mrr": 0.0, "seconds": 0.0}
+    }
+    skipped = 0
+    reused = 0
+
+    print(f"\n--- Router Evaluation ({router}) on {total_questions} Questions ---\n")
+
+    for item in eval_data:
+        q = item['question']
+        target_doc = item['expected_document_title'].lower()
+        print(f"Query: {q}")
+
+        try:
+            start = time.perf_counter()
+            initial_docs = engine.initial_retrieval(q)
+            hop1_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            confidence = engine.hop1_confidence(q, initial_docs)
+            skip = engine.should_skip_reformulation(confidence)
+            route_seconds = time.perf_counter() - start
+
+            cache_hits = engine.reformulation_cache.hits if engine.reformulation_cache else 0
+            start = time.perf_counter()
+            reformulated_query = engine.reformulate_query(q, initial_docs)
+            reformulate_seconds = time.perf_counter() - start
+            if engine.reformulation_cache is not None and engine.reformulation_cache.hits > cache_hits:
+                reused += 1
+
+            start = time.perf_counter()
+            baseline_docs = engine.final_retrieval_and_rerank(reformulated_query, top_k_initial=15, top_k_final=8)
+            hop2_seconds = time.perf_counter() - start
+
+            baseline_rank = find_rank(baseline_docs, target_doc)
+            baseline_seconds = hop1_seconds + reformulate_seconds + hop2_seconds
+            if skip:
+                skipped += 1
+                start = time.perf_counter()
+                routed_docs = engine.final_retrieval_and_rerank(q, top_k_initial=15, top_k_final=8)
+                routed_rank = find_rank(routed_docs, target_doc)
+                routed_seconds = hop1_seconds + route_seconds + (time.perf_counter() - start)
+            else:
+                routed_rank = baseline_rank
+                routed_seconds = baseline_seconds + route_seconds
+
+            for name, rank, seconds in (("baseline", baseline_rank, baseline_seconds),
+                                        ("routed", routed_rank, routed_seconds)):
+                totals[name]["hits"] += 1 if rank else 0
+                totals[name]["mrr"] += calculate_mrr(rank)
+                totals[name]["seconds"] += seconds
+            path = "direct" if skip else "double_hop"
+            print(f"  [{path}] confidence={confidence:.3f} baseline rank={baseline_rank} routed rank={routed_rank} "
+                  f"({baseline_seconds:.2f}s -> {routed_seconds:.2f}s)")
+        except Exception as e:
+            print(f"  [ERROR] {e}")
+
+    print("\n=== ROUTER EVALUATION RESULTS ===")
+    print(f"Total Questions: {total_questions}")
+    print(f"Reformulation skipped: {skipped} ({skipped / total_questions * 100:.1f}%)")
+    for name, t in totals.items():
+        print(f"{name.capitalize():>9}: Hit Rate {t['hits'] / total_questions * 100:.1f}% | "
+              f"MRR {t['mrr'] / total_questions:.3f} | Avg latency {t['seconds'] / total_questions:.2f}s")
+    saved = (totals["baseline"]["seconds"] - totals["routed"]["seconds"]) / total_questions
+    hit_delta = (totals["routed"]["hits"] - totals["baseline"]["hits"]) / total_questions * 100
+    mrr_delta = (totals["routed"]["mrr"] - totals["baseline"]["mrr"]) / total_questions
+    print(f"Latency saved: {saved:.2f}s per query | Hit Rate change: {hit_delta:+.1f} pts | MRR change: {mrr_delta:+.3f}")
+    if reused:
+        print(f"Note: {reused} reformulations came from the cache, so baseline latency is understated.")
+    print("=================================")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hit rate and MRR of the double-hop retrieval")
+    parser.add_argument("--router", nargs="?", const="rerank",
+                        help="Compare the confidence-routed pipeline with the full one (rerank or similarity)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Queries in flight (default QUERY_CONCURRENCY)")
+    parser.add_argument("--checkpoint",
+                        help="JSONL checkpoint to resume an interrupted run from, e.g. retrieval_eval.checkpoint.jsonl")
+    args = parser.parse_args()
+    utils.setup_logging()
+
     generated_path = os.path.join(root_dir, 'data', 'eval_datasets', 'evaluation_dataset.json')
     
-    if os.path.exists(generated_path):
-        run_evaluation(generated_path)
+    if os.path.exists(generated_path) and args.router:
+        run_router_evaluation(generated_path, args.router)
+    elif os.path.exists(generated_path):
+        run_evaluation(generated_path, args.concurrency, args.checkpoint or None)
     else:
         print(f"Dataset not found at: {generated_path}")
         print("Please run: python src/generate_eval_data.py")
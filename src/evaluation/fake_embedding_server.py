@@ -0,0 +1,127 @@
+"""
+Local stand-in for the Gemini `batchEmbedContents` endpoint.
+
+Returns deterministic vectors derived from a hash of each text and can simulate
+quota errors (429), server errors (503) and latency, so the ingestion embedding
+scheduler can be exercised without network access or API quota:
+
+    python src/evaluation/fake_embedding_server.py --port 8765 --rpm 60 --error-rate 0.05
+    EMBEDDING_API_BASE=http://127.0.0.1:8765 GOOGLE_API_KEY=fake python -m src.ingestion
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def fake_vector(text, dim):
+    """Unit-length pseudo-random vector seeded by the text."""
+    values = []
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(v / 2**31 - 1.0 for v in struct.unpack("<8I", digest))
+        counter += 1
+    values = values[:dim]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, dim=768, rpm=0, error_rate=0.0, latency_ms=0):
+        super().__init__(address, FakeEmbeddingHandler)
+        self.dim = dim
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.recent = deque()
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "texts": 0, "rate_limited": 0, "errors": 0}
+
+    def over_quota(self):
+        """Sliding one-minute window, like the provider's per-minute quota."""
+        if not self.rpm:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if len(self.recent) >= self.rpm:
+                return True
+            self.recent.append(now)
+            return False
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with server.lock:
+            server.counters["requests"] += 1
+
+        if not self.path.split("?")[0].endswith(":batchEmbedContents"):
+            self._send(404, {"error": {"code": 404, "message": "Not found"}})
+            return
+        if server.over_quota():
+            with server.lock:
+                server.counters["rate_limited"] += 1
+            self._send(429, {"error": {"code": 429, "message": "Resource exhausted"}}, {"Retry-After": "1"})
+            return
+        if random.random() < server.error_rate:
+            with server.lock:
+                server.counters["errors"] += 1
+            self._send(503, {"error": {"code": 503, "message": "Service unavailable"}})
+            return
+
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000.0)
+        texts = [r["content"]["parts"][0]["text"] for r in request.get("requests", [])]
+        with server.lock:
+            server.counters["texts"] += len(texts)
+        self._send(200, {"embeddings": [{"values": fake_vector(t, server.dim)} for t in texts]})
+
+def serve_in_background(port=0, **kwargs):
+    """Starts a server on a daemon thread; returns (server, base_url)."""
+    server = FakeEmbeddingServer(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini embedding server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before returning 429 (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 503 response")
+    parser.add_argument("--latency-ms", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(
+        ("127.0.0.1", args.port),
+        dim=args.dim,
+        rpm=args.rpm,
+        error_rate=args.error_rate,
+        latency_ms=args.latency_ms
+    )
+    print(f"Fake embedding server listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nServed: {server.counters}")
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up TWO levels to reach project root (src/evaluation -> src -> root)
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+import numpy as np
+
+def post(url, question, timeout):
+    """(HTTP status, seconds) of one /query request; status 0 for connection errors."""
+    body = json.dumps({"query": question}).encode("utf-8")
+    request = urllib.request.Request(url + "/query", data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - start
+
+def health_pid(url):
+    try:
+        with urllib.request.urlopen(url + "/health", timeout=2) as response:
+            return json.loads(response.read())["pid"]
+    except (urllib.error.URLError, OSError, ValueError, KeyError):
+        return None
+
+def wait_until_ready(url, process, workers, timeout):
+    """Waits until `workers` distinct worker processes have answered /health (a
+    worker only accepts connections once its engine is warmed up)."""
+    deadline = time.monotonic() + timeout
+    pids = set()
+    with ThreadPoolExecutor(max_workers=4 * workers) as pool:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise SystemExit(f"Server exited with code {process.returncode} before it was ready.")
+            pids.update(p for p in pool.map(health_pid, [url] * (4 * workers)) if p is not None)
+            if len(pids) >= workers:
+                return
+            time.sleep(0.2)
+    raise SystemExit(f"Only {len(pids)} of {workers} workers at {url} ready after {timeout}s.")
+
+def start_server(workers, port, offline, extra_env):
+    command = [sys.executable, "-m", "src.server", "--workers", str(workers), "--port", str(port),
+               "--host", "127.0.0.1"]
+    if offline:
+        command.append("--offline")
+    return subprocess.Popen(command, cwd=root_dir, env=dict(os.environ, **extra_env))
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def run_load(url, questions, requests_total, clients, timeout):
+    """Sends `requests_total` queries from `clients` threads; returns throughput and latency stats."""
+    jobs = [questions[i % len(questions)] for i in range(requests_total)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda q: post(url, q, timeout), jobs))
+    elapsed = time.perf_counter() - start
+
+    ok = [seconds * 1000 for status, seconds in results if status == 200]
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": requests_total,
+        "clients": clients,
+        "seconds": elapsed,
+        "throughput_rps": len(ok) / elapsed,
+        "p50_ms": float(np.percentile(ok, 50)) if ok else None,
+        "p95_ms": float(np.percentile(ok, 95)) if ok else None,
+        "statuses": statuses
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test of src/server.py: throughput and latency as the number of workers grows"
+    )
+    parser.add_argument("--workers", default="1,2,4",
+                        help="Comma-separated worker counts; a server is started for each")
+    parser.add_argument("--url", help="Test an already running server instead (ignores --workers)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--offline", action="store_true",
+                        help="Offline index with stand-in LLM and embeddings (no API keys, no LLM rate limits)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent client threads")
+    parser.add_argument("--timeout", type=float, default=120, help="Client-side timeout per request")
+    parser.add_argument("--ready-timeout", type=float, default=600, help="Seconds to wait for startup")
+    parser.add_argument("--keep-cache", action="store_true",
+                        help="Leave the answer cache on (by default repeated questions would just hit it)")
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    with open(os.path.join(root_dir, 'data', 'eval_datasets', 'evaluation_dataset.json'), 'r', encoding='utf-8') as f:
+        questions = [item['question'] for item in json.load(f)]
+
+    if args.offline:
+        from src import offline
+        embeddings = offline.HashingEmbeddings()
+        if not offline.index_is_current(embeddings):
+            print("Building offline index...")
+            offline.build_index(embeddings)
+
+    extra_env = {} if args.keep_cache else {"ANSWER_CACHE_ENABLED": "false", "REFORMULATION_CACHE_PATH": ""}
+    results = []
+    runs = [(None, args.url)] if args.url else [
+        (int(w), f"http://127.0.0.1:{args.port}") for w in args.workers.split(",")
+    ]
+    for workers, url in runs:
+        process = start_server(workers, args.port, args.offline, extra_env) if workers else None
+        try:
+            start = time.perf_counter()
+            wait_until_ready(url, process, workers or 1, args.ready_timeout)
+            startup = time.perf_counter() - start
+            post(url, questions[0], args.timeout)  # first request outside the measurement
+            row = run_load(url, questions, args.requests, args.clients, args.timeout)
+        finally:
+            if process is not None:
+                stop_server(process)
+        row["workers"] = workers
+        row["startup_seconds"] = startup
+        results.append(row)
+        p50 = f"{row['p50_ms']:.0f}ms" if row["p50_ms"] is not None else "-"
+        p95 = f"{row['p95_ms']:.0f}ms" if row["p95_ms"] is not None else "-"
+        print(f"workers {workers or '?':>3} | {row['throughput_rps']:6.2f} req/s | p50 {p50} p95 {p95} | "
+              f"statuses {row['statuses']} | ready after {startup:.1f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
@@ -1,70 +1,388 @@
+import copy
+import hashlib
+import itertools
 import json
 import os
-from langchain_community.document_loaders import JSONLoader
+import sys
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from . import config
+from . import chunking, config, embedding_providers
+from .embedding_pipeline import get_scheduler
+from .embedding_cache import get_cache
+from .vector_store import (IndexWriter, VectorStore, check_index_type, index_exists, publish_index,
+                           read_store_info, resolve_index_path)
+from .cleaning import BoilerplateModel, CleaningReport, NearDuplicateFilter
 
-def load_data():
+MANIFEST_FILE = "manifest.json"
+BOILERPLATE_FILE = "boilerplate.json"
+
+_JSON_WHITESPACE = " \t\r\n"
+
+def iter_json_array(path, read_size=1 << 16):
+    """Yields the elements of a top-level JSON array without loading the whole file.
+
+    Only the current element plus one read buffer is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        eof = False
+        started = False
+        while True:
+            buffer = buffer.lstrip(_JSON_WHITESPACE)
+            if not buffer and not eof:
+                chunk = f.read(read_size)
+                eof = not chunk
+                buffer = chunk
+                continue
+            if not started:
+                if not buffer.startswith("["):
+                    raise ValueError(f"{path} does not contain a list of objects.")
+                buffer = buffer[1:]
+                started = True
+                continue
+            if not buffer:
+                raise ValueError(f"Unexpected end of file in {path}.")
+            if buffer[0] == "]":
+                return
+            if buffer[0] == ",":
+                buffer = buffer[1:]
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer)
+                # A number at the very end of the buffer may continue in the next read.
+                complete = eof or end < len(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                # Element spans past the buffer: read more (doubling for big elements).
+                chunk = f.read(max(read_size, len(buffer)))
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+def _entry_to_document(entry):
+    metadata = {
+        "title": entry.get("title", ""),
+        "link": entry.get("link", ""),
+        "publish_date": entry.get("publish_date", ""),
+        "tags": entry.get("tags", []),
+        "theme": entry.get("theme", "")
+    }
+    content = entry.get("content", "")
+    return Document(page_content=content, metadata=metadata)
+
+def iter_raw_documents(strict=False):
+    """Streams every article in DATA_PATH as a Document, one file at a time.
+
+    A file that fails to load is skipped with a message, unless `strict`: index
+    builds must not go on with part of a file, since an update would then remove
+    the articles it could not read from the index.
+    """
     if not os.path.exists(config.DATA_PATH):
         raise FileNotFoundError(f"Data directory not found at {config.DATA_PATH}")
-    all_data = []
-    for filename in os.listdir(config.DATA_PATH):
+    for filename in sorted(os.listdir(config.DATA_PATH)):
         if filename.endswith(".json"):
             file_path = os.path.join(config.DATA_PATH, filename)
             print(f"Loading data from {filename}...")
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        all_data.extend(data)
-                    else:
-                        print(f"Warning: {filename} does not contain a list of objects. Skipping.")
+                for entry in iter_json_array(file_path):
+                    if isinstance(entry, dict):
+                        yield _entry_to_document(entry)
             except Exception as e:
+                if strict:
+                    raise ValueError(f"Error loading {filename}: {e}. Fix or remove the file and rebuild.") from e
                 print(f"Error loading {filename}: {e}")
 
-    docs = []
-    for entry in all_data:
-        metadata = {
-            "title": entry.get("title", ""),
-            "link": entry.get("link", ""),
-            "publish_date": entry.get("publish_date", ""),
-            "tags": entry.get("tags", []),
-            "theme": entry.get("theme", "")
-        }
-        content = entry.get("content", "")
-        doc = Document(page_content=content, metadata=metadata)
-        docs.append(doc)
+def load_raw_data(strict=False):
+    return list(iter_raw_documents(strict))
+
+def fit_boilerplate(boilerplate):
+    """Fits an unfitted model on a bounded sample of the corpus (BOILERPLATE_SAMPLE_DOCS)."""
+    if boilerplate.fitted:
+        return boilerplate
+    print("Learning boilerplate shingles...")
+    sample = itertools.islice(iter_raw_documents(), config.BOILERPLATE_SAMPLE_DOCS)
+    boilerplate.fit(d.page_content for d in sample)
+    print(f"Found {len(boilerplate.boilerplate)} boilerplate shingles.")
+    return boilerplate
+
+def iter_clean_documents(docs, boilerplate, report):
+    """Strips learned site chrome and drops near-duplicate articles, one article at a time."""
+    duplicates = NearDuplicateFilter()
+    for doc in docs:
+        text = boilerplate.strip(doc.page_content)
+        duplicate_of = duplicates.check(article_key(doc), text)
+        if duplicate_of:
+            report.record(doc.page_content, None)
+            continue
+        report.record(doc.page_content, text)
+        yield Document(page_content=text, metadata=doc.metadata)
+
+def load_data(boilerplate=None, strict=False):
+    """Loads all theme files as Documents, cleaned unless CLEAN_BOILERPLATE is off.
+
+    Args:
+        boilerplate: Optional BoilerplateModel. An unfitted model is fitted on this
+            corpus in place; a fitted one (e.g. from the saved index) is reused as is.
+        strict: Raise on a file that fails to load instead of skipping it (see
+            iter_raw_documents); for callers that build an index.
+    """
+    if not config.CLEAN_BOILERPLATE:
+        return load_raw_data(strict)
+    boilerplate = fit_boilerplate(boilerplate or BoilerplateModel())
+    report = CleaningReport()
+    docs = list(iter_clean_documents(iter_raw_documents(strict), boilerplate, report))
+    print(report.summary())
     return docs
 
-def build_index():
-    print("Loading data...")
-    raw_docs = load_data()
-    
-    print(f"Splitting {len(raw_docs)} documents...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=config.CHUNK_SIZE,
-        chunk_overlap=config.CHUNK_OVERLAP
+def article_key(doc):
+    """Stable identity of an article: its link, falling back to the title."""
+    return doc.metadata.get("link") or doc.metadata.get("title", "")
+
+def content_hash(doc):
+    """Hash of everything that ends up in the index for one article."""
+    payload = json.dumps(
+        {"content": doc.page_content, "metadata": doc.metadata},
+        sort_keys=True,
+        ensure_ascii=False
     )
-    splits = text_splitter.split_documents(raw_docs)
-    
-    print("Initializing Embeddings...")
-    if not config.GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def chunk_ids_for(key, digest, count):
+    """Deterministic chunk IDs; the content hash keeps edited articles from reusing old IDs."""
+    prefix = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{digest[:8]}-{i}" for i in range(count)]
+
+def _manifest_path(index_path=None):
+    return os.path.join(resolve_index_path(index_path), MANIFEST_FILE)
+
+def _boilerplate_path(index_path=None):
+    return os.path.join(resolve_index_path(index_path), BOILERPLATE_FILE)
+
+def _index_settings(index_type):
+    return {
+        "embedding_model": embedding_providers.model_name(),
+        "chunk_size": config.CHUNK_SIZE,
+        "chunk_overlap": config.CHUNK_OVERLAP,
+        "clean_boilerplate": config.CLEAN_BOILERPLATE,
+        "index_type": index_type
+    }
+
+def _current_index_type():
+    """FAISS index type of the index at INDEX_PATH, or None."""
+    try:
+        return read_store_info(config.INDEX_PATH).get("index_type")
+    except (OSError, ValueError):
+        return None
+
+def load_manifest():
+    path = _manifest_path()
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(articles, index_type, index_path=None):
+    manifest = {"settings": _index_settings(index_type), "articles": articles}
+    path = _manifest_path(index_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _can_update_incrementally(manifest, index_type):
+    if manifest is None:
+        print("No manifest found. Falling back to a full rebuild.")
+        return False
+    settings = dict(manifest.get("settings") or {})
+    # Manifests written before the index type was recorded: take it from store.json.
+    settings.setdefault("index_type", _current_index_type())
+    if settings != _index_settings(index_type):
+        print("Embedding model, chunking settings or index type changed. Falling back to a full rebuild.")
+        return False
+    if not index_exists():
+        print("Index files missing. Falling back to a full rebuild.")
+        return False
+    return True
+
+class _IndexPlan:
+    """Tracks manifest entries, stale chunk IDs and article counts while streaming."""
 
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model=config.EMBEDDING_MODEL,
-        google_api_key=config.GOOGLE_API_KEY
+    def __init__(self, old_articles):
+        self.old_articles = old_articles
+        self.articles = {}
+        self.seen = set()
+        self.stale_ids = []
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+    def iter_pending(self, docs):
+        """Yields ((key, digest), doc) for every article that needs (re-)embedding."""
+        for doc in docs:
+            key = article_key(doc)
+            if key in self.seen:
+                print(f"Warning: duplicate article '{key}'. Keeping the first copy.")
+                continue
+            self.seen.add(key)
+            digest = content_hash(doc)
+            entry = self.old_articles.get(key)
+            if entry and entry["hash"] == digest:
+                self.articles[key] = entry
+                self.counts["unchanged"] += 1
+                continue
+            if entry:
+                self.stale_ids.extend(entry["chunk_ids"])
+                self.counts["changed"] += 1
+            else:
+                self.counts["new"] += 1
+            yield (key, digest), doc
+
+    def iter_chunks(self, docs, workers=None):
+        """Yields (chunk, chunk_id) for every article that needs embedding."""
+        for (key, digest), doc, texts in chunking.iter_split(self.iter_pending(docs), workers):
+            ids = chunk_ids_for(key, digest, len(texts))
+            self.articles[key] = {"hash": digest, "chunk_ids": ids}
+            for text, chunk_id in zip(texts, ids):
+                yield Document(page_content=text, metadata=copy.deepcopy(doc.metadata)), chunk_id
+
+    def finish(self):
+        """Collects chunks of articles that disappeared from the corpus."""
+        for key, entry in self.old_articles.items():
+            if key not in self.articles:
+                self.stale_ids.extend(entry["chunk_ids"])
+                self.counts["removed"] += 1
+
+    @property
+    def changed(self):
+        return bool(self.stale_ids) or self.counts["new"] > 0 or self.counts["changed"] > 0
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def _write_chunks_streaming(writer, chunk_stream, scheduler, cache):
+    """Embeds (chunk, id) pairs batch by batch and appends each batch to the index as it completes."""
+    batches = (
+        (batch, [chunk.page_content for chunk, _ in batch])
+        for batch in _batched(chunk_stream, scheduler.batch_size)
     )
-    
-    print("Creating FAISS index...")
-    vectorstore = FAISS.from_documents(splits, embeddings)
-    
-    print(f"Saving index to {config.INDEX_PATH}...")
-    vectorstore.save_local(config.INDEX_PATH)
-    print("Index built and saved successfully.")
+    for batch, vectors in scheduler.embed_stream(batches, cache=cache):
+        writer.add(
+            [chunk_id for _, chunk_id in batch],
+            [chunk.page_content for chunk, _ in batch],
+            [chunk.metadata for chunk, _ in batch],
+            vectors
+        )
+
+def build_index(incremental=False, chunk_workers=None, index_type=None):
+    """Streams articles through clean -> chunk -> embed -> index append.
+
+    Parsing, cleaning and chunking run lazily in this thread while earlier batches
+    are embedded by the scheduler's worker pool, so embedding starts before the
+    later theme files are even opened and memory does not grow with the raw corpus.
+    With `incremental=True`, only new or changed articles are embedded; unchanged
+    chunks are copied over from the current index with their stored vectors.
+    `chunk_workers` (default CHUNK_WORKERS) > 1 splits articles in a process pool.
+    `index_type` selects the FAISS index, see src/ann.py; by default INDEX_TYPE,
+    or with `incremental=True` the type of the current index. A different type
+    than the current index's always means a full rebuild.
+
+    The new index is written next to INDEX_PATH and published when complete (see
+    vector_store.publish_index), so a failed build never leaves a half-written
+    index behind.
+    """
+    manifest = load_manifest() if incremental else None
+    if index_type is None and incremental:
+        index_type = _current_index_type()
+        if index_type is not None:
+            print(f"Keeping the current index type ({index_type}); pass --index-type to change it.")
+    index_type = check_index_type(index_type)
+    incremental = incremental and _can_update_incrementally(manifest, index_type)
+
+    print("Initializing Embeddings...")
+    cache = get_cache()
+    scheduler = get_scheduler()
+
+    docs = iter_raw_documents(strict=True)
+    report = None
+    boilerplate = None
+    if config.CLEAN_BOILERPLATE:
+        # Incremental updates reuse the saved boilerplate model so that cleaning of
+        # unchanged articles (and therefore their hashes) stays stable.
+        boilerplate = BoilerplateModel.load(_boilerplate_path()) if incremental else BoilerplateModel()
+        fit_boilerplate(boilerplate)
+        report = CleaningReport()
+        docs = iter_clean_documents(docs, boilerplate, report)
+
+    plan = _IndexPlan(manifest["articles"] if incremental else {})
+    build_path = config.INDEX_PATH + ".building"
+    writer = IndexWriter(build_path, index_type)
+
+    print("Streaming articles through chunking and embedding...")
+    try:
+        chunk_stream = plan.iter_chunks(docs, chunk_workers)
+        _write_chunks_streaming(writer, chunk_stream, scheduler, cache)
+    except BaseException:
+        writer.abort()
+        raise
+    plan.finish()
+
+    if report is not None:
+        print(report.summary())
+    counts = plan.counts
+    print(f"Articles: {counts['new']} new, {counts['changed']} changed, "
+          f"{counts['removed']} removed, {counts['unchanged']} unchanged.")
+    stats = scheduler.stats
+    if stats["seconds"] > 0:
+        print(f"Embedding finished: {stats['chunks']} chunks in {stats['batches']} batches, "
+              f"{stats['retries']} retries, {stats['chunks'] / stats['seconds']:.1f} chunks/s.")
+    if cache is not None:
+        print(f"Embedding cache: {cache.stats()}")
+
+    if incremental and not plan.changed:
+        writer.abort()
+        print("Index is already up to date.")
+        return
+
+    try:
+        if incremental:
+            old_store = VectorStore.load(config.INDEX_PATH)
+            stale = set(plan.stale_ids)
+            kept_rows = [
+                row for row in range(len(old_store))
+                if old_store.chunks.value("chunk_id", row) not in stale
+            ]
+            print(f"Dropping {len(stale)} stale chunks; carrying over {len(kept_rows)} unchanged chunks...")
+            writer.copy_rows(old_store, kept_rows)
+
+        info = writer.close()
+        save_manifest(plan.articles, index_type, build_path)
+        if boilerplate is not None and boilerplate.fitted:
+            boilerplate.save(_boilerplate_path(build_path))
+    except BaseException:
+        writer.abort()
+        raise
+
+    print(f"Saving index to {config.INDEX_PATH} ({info['count']} chunks)...")
+    publish_index(build_path, config.INDEX_PATH)
+    print("Index updated successfully." if incremental else "Index built and saved successfully.")
+
+def _cli_option(name, default=None):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
 
 if __name__ == "__main__":
-    build_index()
+    workers = _cli_option("--chunk-workers")
+    build_index(
+        incremental="--update" in sys.argv,
+        chunk_workers=int(workers) if workers is not None else None,
+        index_type=_cli_option("--index-type")
+    )
@@ -0,0 +1,136 @@
+import json
+import os
+import numpy as np
+
+# Index directory layout (inside the vector index directory, see vector_store.py):
+#   metadata.json   row count, theme and tag vocabularies
+#   themes.bits     one packed bitmap (LSB-first, ceil(n/8) bytes) per theme
+#   tags.bits       one packed bitmap per tag
+#   dates.i32       publish date of each row as YYYYMMDD (0 = unknown)
+#   date_order.u32  rows sorted by date, so a date range is one contiguous slice
+META_FILE = "metadata.json"
+THEMES_FILE = "themes.bits"
+TAGS_FILE = "tags.bits"
+DATES_FILE = "dates.i32"
+DATE_ORDER_FILE = "date_order.u32"
+
+def _normalize(value):
+    return " ".join(str(value).lower().split())
+
+def date_key(value, end=False):
+    """YYYYMMDD integer for "2023", "2023-06" or an ISO date/timestamp; 0 if unparseable.
+
+    With `end=True` a partial date rounds up ("2023" -> 20231231), so it can be
+    used as an inclusive upper bound.
+    """
+    parts = str(value or "")[:10].split("-")
+    try:
+        year = int(parts[0])
+        month = int(parts[1]) if len(parts) > 1 else (12 if end else 1)
+        day = int(parts[2]) if len(parts) > 2 else (31 if end else 1)
+    except ValueError:
+        return 0
+    return year * 10000 + month * 100 + day
+
+def _packed(rows_by_value, count):
+    bitmaps = np.zeros((len(rows_by_value), (count + 7) // 8), dtype="uint8")
+    for i, rows in enumerate(rows_by_value):
+        mask = np.zeros(count, dtype=bool)
+        mask[rows] = True
+        bitmaps[i] = np.packbits(mask, bitorder="little")
+    return bitmaps
+
+def build_index(store, path):
+    """Builds theme/tag bitmaps and the date column for every row of a ChunkStore."""
+    os.makedirs(path, exist_ok=True)
+    count = len(store)
+    themes, tags = {}, {}
+    dates = np.zeros(count, dtype="<i4")
+    for row in range(count):
+        themes.setdefault(_normalize(store.value("theme", row)), []).append(row)
+        for tag in set(json.loads(store.value("tags", row) or "[]")):
+            tags.setdefault(_normalize(tag), []).append(row)
+        dates[row] = date_key(store.value("publish_date", row))
+
+    theme_names, tag_names = sorted(themes), sorted(tags)
+    _packed([themes[t] for t in theme_names], count).tofile(os.path.join(path, THEMES_FILE))
+    _packed([tags[t] for t in tag_names], count).tofile(os.path.join(path, TAGS_FILE))
+    dates.tofile(os.path.join(path, DATES_FILE))
+    np.argsort(dates, kind="stable").astype("<u4").tofile(os.path.join(path, DATE_ORDER_FILE))
+
+    meta = {"count": count, "themes": theme_names, "tags": tag_names}
+    with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+def _map(path, dtype, shape):
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+class Selection:
+    """The rows matching a filter, as a packed bitmap plus the sorted row numbers."""
+
+    def __init__(self, bitmap, count):
+        self.bitmap = np.ascontiguousarray(bitmap, dtype="uint8")
+        self.rows = np.flatnonzero(np.unpackbits(self.bitmap, count=count, bitorder="little"))
+
+    def __len__(self):
+        return len(self.rows)
+
+class MetadataIndex:
+    """Memory-mapped theme/tag/date index over the rows of a vector index."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.themes = {t: i for i, t in enumerate(meta["themes"])}
+        self.tags = {t: i for i, t in enumerate(meta["tags"])}
+        width = (self.count + 7) // 8
+        self.theme_bits = _map(os.path.join(path, THEMES_FILE), "uint8", (len(self.themes), width))
+        self.tag_bits = _map(os.path.join(path, TAGS_FILE), "uint8", (len(self.tags), width))
+        self.dates = _map(os.path.join(path, DATES_FILE), "<i4", (self.count,))
+        self.date_order = _map(os.path.join(path, DATE_ORDER_FILE), "<u4", (self.count,))
+        self._sorted_dates = None
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    def _any_of(self, bitmaps, vocabulary, values):
+        ids = [vocabulary[v] for v in (_normalize(v) for v in values) if v in vocabulary]
+        if not ids:
+            return np.zeros(bitmaps.shape[1], dtype="uint8")
+        return np.bitwise_or.reduce(bitmaps[sorted(ids)], axis=0)
+
+    def _date_range(self, date_from, date_to):
+        if self._sorted_dates is None:
+            self._sorted_dates = self.dates[self.date_order]
+        sorted_dates = self._sorted_dates
+        start = np.searchsorted(sorted_dates, date_key(date_from), "left") if date_from else 0
+        # Rows with an unknown date (0) sort first and are left out of any date range.
+        start = max(start, np.searchsorted(sorted_dates, 1, "left"))
+        end = np.searchsorted(sorted_dates, date_key(date_to, end=True), "right") if date_to else self.count
+        mask = np.zeros(self.count, dtype=bool)
+        mask[self.date_order[start:end]] = True
+        return np.packbits(mask, bitorder="little")
+
+    def select(self, theme=None, tags=None, date_from=None, date_to=None):
+        """Selection of rows matching every given filter, or None when no filter is set.
+
+        Args:
+            theme: A theme name or a list of them (any of).
+            tags: A tag or a list of tags (any of).
+            date_from, date_to: Inclusive publish date bounds ("2023", "2023-06-01", ...).
+        """
+        if not (theme or tags or date_from or date_to):
+            return None
+        bitmap = np.full((self.count + 7) // 8, 0xFF, dtype="uint8")
+        if theme:
+            bitmap &= self._any_of(self.theme_bits, self.themes, [theme] if isinstance(theme, str) else theme)
+        if tags:
+            bitmap &= self._any_of(self.tag_bits, self.tags, [tags] if isinstance(tags, str) else tags)
+        if date_from or date_to:
+            bitmap &= self._date_range(date_from, date_to)
+        return Selection(bitmap, self.count)
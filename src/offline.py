@@ -0,0 +1,112 @@
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from . import bm25, chunking, config, ingestion
+from .vector_store import STORE_FILE, IndexWriter, publish_index, resolve_index_path
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic local embeddings: BM25 tokens hashed into `dim` signed buckets.
+
+    No model or network is involved, so vectors are identical on every machine.
+    Texts sharing (stemmed) terms end up close, which is enough to exercise the
+    dense and hybrid retrieval paths offline.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim or config.OFFLINE_EMBEDDING_DIM
+        self.model = f"hashing-{self.dim}"
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype="float32")
+        for token, count in Counter(bm25.tokenize(text)).items():
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += (1.0 if h >> 63 else -1.0) * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def canned_llm(reformulations=None):
+    """Chat-model stand-in for RAGEngine(llm=...).
+
+    Reformulation prompts get `reformulations[question]`, or the question itself
+    when it has no canned entry; answer prompts get the opening of the first
+    reference document.
+    """
+    reformulations = reformulations or {}
+
+    def respond(prompt):
+        text = prompt.to_string()
+        match = re.search(r"Pertanyaan User: (.*)", text)
+        if match:
+            query = match.group(1).strip()
+            return AIMessage(content=reformulations.get(query, query))
+        match = re.search(r"\[ISI KONTEN\]:\n(.*?)\n-{10,}", text, flags=re.DOTALL)
+        return AIMessage(content=match.group(1).strip()[:500] if match else "")
+
+    return RunnableLambda(respond, name="canned-llm")
+
+class LexicalReranker:
+    """Reranker stand-in: scores a doc by how many distinct query terms it contains."""
+
+    backend = "lexical"
+    batcher = None
+
+    def score(self, query, docs):
+        terms = set(bm25.tokenize(query))
+        return [float(len(terms.intersection(bm25.tokenize(d.page_content)))) for d in docs]
+
+    def stats(self):
+        return {"backend": self.backend}
+
+def build_index(embeddings, path=None, index_type="flat", batch_size=256):
+    """Builds an index of the local corpus with `embeddings` at `path` (default
+    OFFLINE_INDEX_PATH), chunked and cleaned exactly like ingestion.build_index."""
+    path = path or config.OFFLINE_INDEX_PATH
+    writer = IndexWriter(path + ".building", index_type)
+    articles = (
+        ((ingestion.article_key(doc), ingestion.content_hash(doc)), doc)
+        for doc in ingestion.load_data(strict=True)
+    )
+    batch = []
+
+    def flush():
+        texts = [text for _, text, _ in batch]
+        writer.add([chunk_id for chunk_id, _, _ in batch], texts, [m for _, _, m in batch],
+                   embeddings.embed_documents(texts))
+        batch.clear()
+
+    try:
+        for (key, digest), doc, texts in chunking.iter_split(articles):
+            for text, chunk_id in zip(texts, ingestion.chunk_ids_for(key, digest, len(texts))):
+                batch.append((chunk_id, text, dict(doc.metadata)))
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
+        info = writer.close(embedding_provider="offline",
+                            embedding_model=getattr(embeddings, "model", type(embeddings).__name__))
+    except BaseException:
+        writer.abort()
+        raise
+    publish_index(path + ".building", path)
+    return info
+
+def index_is_current(embeddings, path=None):
+    """True when `path` holds an index built with the same stand-in embeddings."""
+    store_file = os.path.join(resolve_index_path(path or config.OFFLINE_INDEX_PATH), STORE_FILE)
+    if not os.path.exists(store_file):
+        return False
+    with open(store_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get("embedding_model") == getattr(embeddings, "model", None)
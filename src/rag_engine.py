@@ -1,70 +1,385 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
+import random
+import re
+import threading
 import time
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.prompts import PromptTemplate
-from sentence_transformers import CrossEncoder
-from . import config, utils
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from . import config, context_packer, diversity, embedding_providers, tracing, utils
+from .answer_cache import get_answer_cache, normalize_query
+from .batcher import BatchedQueryEmbeddings
+from .reformulation_cache import cache_key as reformulation_key, get_reformulation_cache
+from .embedding_cache import CachedEmbeddings, get_cache
+from .embedding_pipeline import estimate_tokens, shared_rate_limiter
+from .reranker import Reranker
+from .retrieval import MODES as RETRIEVAL_MODES, Retriever, reciprocal_rank_fusion
+from .vector_store import VectorStore, read_store_info
+
+logger = logging.getLogger(__name__)
+
+# Heavy parts of a RAGEngine, created on first use; see RAGEngine.warmup.
+COMPONENTS = ("llm", "embeddings", "vectorstore", "retriever", "reranker")
+
+def _strip_think(content):
+    return re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
+
+def _record_llm_usage(inputs, content, usage=None):
+    """Counts prompt and completion tokens, as reported by the provider or else
+    estimated, and returns their total."""
+    usage = usage or {}
+    prompt_tokens = usage.get("input_tokens") or estimate_tokens("".join(inputs.values()))
+    completion_tokens = usage.get("output_tokens") or (estimate_tokens(content) if content else 0)
+    tracing.count("llm_calls")
+    tracing.count("llm_prompt_tokens", prompt_tokens)
+    tracing.count("llm_completion_tokens", completion_tokens)
+    return prompt_tokens + completion_tokens
+
+def _is_rate_limit_error(error):
+    """True for a provider's 429 (Groq and Gemini clients raise different exception types)."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "resource_exhausted" in message
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _dump_result(result):
+    """JSON-safe copy of a pipeline result (final_docs as page_content + metadata dicts)."""
+    result = dict(result)
+    if "final_docs" in result:
+        result["final_docs"] = [{"page_content": d.page_content, "metadata": d.metadata} for d in result["final_docs"]]
+    return result
+
+def _load_result(result):
+    from langchain_core.documents import Document
+    if "final_docs" in result:
+        result["final_docs"] = [Document(**d) for d in result["final_docs"]]
+    return result
+
+def _read_checkpoint(path, settings):
+    """Successful results already in a checkpoint file, by query (same settings fingerprint only)."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # partial line from an interrupted write
+            if record.get("settings") == settings and "result" in record:
+                done[record["query"]] = record["result"]
+    return done
+
+class _EngineEmbeddings:
+    """What the engine's VectorStore sees as its embeddings: resolves
+    engine.embeddings only when a query is actually embedded."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def embed_query(self, text):
+        return self.engine.embeddings.embed_query(text)
+
+    def embed_documents(self, texts):
+        return self.engine.embeddings.embed_documents(texts)
 
 class RAGEngine:
-    def __init__(self):
-        if not config.GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY not set.")
-            
-        if not config.GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY not set.")
-            
-        if config.LLM_PROVIDER == "groq":
+    def __init__(self, nprobe=None, ef_search=None, hop1_mode=None, hop2_mode=None, router=None,
+                 batching=None, llm=None, embeddings=None, reranker=None, index_path=None, diversify=None):
+        """
+        Args:
+            nprobe: IVF lists probed per search (IVF index types only).
+            ef_search: HNSW search breadth (HNSW index only).
+            hop1_mode: "dense", "bm25" or "hybrid" (default HOP1_RETRIEVAL).
+                "bm25" makes hop 1 run without any embedding call.
+            hop2_mode: Same choice for hop 2 (default HOP2_RETRIEVAL).
+            router: "rerank", "similarity" or "off" (default HOP_ROUTER); see hop1_confidence.
+            batching: Share reranker and query-embedding batches across concurrent
+                requests (default BATCHING_ENABLED); for multi-threaded servers.
+            llm, embeddings, reranker: Components to use instead of the configured
+                providers, e.g. the local stand-ins in src/offline.py. Injected
+                components get no API key checks, rate limit or embedding cache.
+            index_path: Index to load (default INDEX_PATH).
+            diversify: Pick the reranker's hop-2 candidates with MMR (default
+                DIVERSIFY_CANDIDATES); see diversify().
+        """
+        batching = config.BATCHING_ENABLED if batching is None else batching
+        self.batching = batching
+        self.index_path = index_path or config.INDEX_PATH
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+        # The LLM client, embeddings, index and reranker are created on first use
+        # (or all at once by warmup()); only cheap configuration checks run here.
+        self._components = {}
+        self._component_locks = {name: threading.Lock() for name in COMPONENTS}
+
+        self.llm_limiter = None
+        if llm is not None:
+            self._components["llm"] = llm
+            self.llm_model = getattr(llm, "name", None) or type(llm).__name__
+        elif config.LLM_PROVIDER == "groq":
             if not config.GROQ_API_KEY:
                 raise ValueError("GROQ_API_KEY not set but LLM_PROVIDER is 'groq'")
-            
+            self.llm_model = config.GROQ_MODEL
+            self.llm_limiter = shared_rate_limiter("groq", config.GROQ_RPM, config.GROQ_TPM)
+        else:
+            if not config.GOOGLE_API_KEY:
+                raise ValueError("GOOGLE_API_KEY not set but LLM_PROVIDER is 'gemini'")
+            self.llm_model = config.LLM_MODEL
+            self.llm_limiter = shared_rate_limiter("gemini", config.GEMINI_RPM, config.GEMINI_TPM)
+
+        self.injected_embeddings = embeddings
+        if embeddings is None:
+            embedding_providers.model_name()  # rejects an unknown EMBEDDING_PROVIDER now
+            if config.EMBEDDING_PROVIDER == "google" and not config.GOOGLE_API_KEY:
+                raise ValueError("GOOGLE_API_KEY not set but EMBEDDING_PROVIDER is 'google'")
+        self.query_embeddings = None
+        # The cache is keyed by the provider's model, so injected embeddings bypass it.
+        self.embedding_cache = get_cache() if embeddings is None else None
+
+        if reranker is not None:
+            self._components["reranker"] = reranker
+        self.answer_cache = get_answer_cache()
+        self.reformulation_cache = get_reformulation_cache()
+        self.hop1_mode = hop1_mode or config.HOP1_RETRIEVAL
+        self.hop2_mode = hop2_mode or config.HOP2_RETRIEVAL
+        for name, mode in (("hop1_mode", self.hop1_mode), ("hop2_mode", self.hop2_mode)):
+            if mode not in RETRIEVAL_MODES:
+                raise ValueError(f"Unknown {name} '{mode}'. Choose one of: {', '.join(RETRIEVAL_MODES)}.")
+        self.router = router or config.HOP_ROUTER
+        if self.router not in ("rerank", "similarity", "off"):
+            raise ValueError(f"Unknown router '{self.router}'. Choose one of: rerank, similarity, off.")
+        self.diversify_candidates = config.DIVERSIFY_CANDIDATES if diversify is None else diversify
+
+    def _component(self, name, factory):
+        """Component `name`, built by `factory` on first use. Each component has its
+        own lock, so warmup() threads build different ones in parallel and
+        concurrent first requests never build one twice."""
+        if name in self._components:
+            return self._components[name]
+        with self._component_locks[name]:
+            if name not in self._components:
+                self._components[name] = factory()
+            return self._components[name]
+
+    def _create_llm(self):
+        if config.LLM_PROVIDER == "groq":
             from langchain_groq import ChatGroq
-            print(f"DEBUG: Using Groq LLM ({config.GROQ_MODEL})")
-            self.llm = ChatGroq(
+            logger.info("Using Groq LLM (%s)", config.GROQ_MODEL)
+            return ChatGroq(
                 model=config.GROQ_MODEL,
                 api_key=config.GROQ_API_KEY,
                 temperature=0.7
             )
-        else:
-            print(f"DEBUG: Using Gemini LLM ({config.LLM_MODEL})")
-            self.llm = ChatGoogleGenerativeAI(
-                model=config.LLM_MODEL,
-                google_api_key=config.GOOGLE_API_KEY,
-                temperature=0.7
-            )
-        
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model=config.EMBEDDING_MODEL,
-            google_api_key=config.GOOGLE_API_KEY
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        logger.info("Using Gemini LLM (%s)", config.LLM_MODEL)
+        return ChatGoogleGenerativeAI(
+            model=config.LLM_MODEL,
+            google_api_key=config.GOOGLE_API_KEY,
+            temperature=0.7
         )
-        
+
+    def _create_embeddings(self):
+        if self.injected_embeddings is not None:
+            embeddings = self.injected_embeddings
+        else:
+            # Provider from EMBEDDING_PROVIDER ("google" or a local CPU model), see embedding_providers.py.
+            embeddings = embedding_providers.get_embeddings()
+            # _load_vectorstore checks the provider and model without waiting for
+            # the model; the dimension is only known here. store.json is read
+            # directly, since the index may still be loading in parallel.
+            try:
+                info = read_store_info(self.index_path)
+            except (OSError, ValueError):
+                info = None  # reported by _load_vectorstore
+            if info is not None:
+                embedding_providers.check_index(info, embeddings, path=self.index_path)
+        if self.batching:
+            # Below the cache, so only cache misses are batched.
+            self.query_embeddings = BatchedQueryEmbeddings(embeddings)
+            embeddings = self.query_embeddings
+        if self.embedding_cache is not None:
+            embeddings = CachedEmbeddings(embeddings, self.embedding_cache)
+        return embeddings
+
+    def _load_vectorstore(self):
         try:
-            self.vectorstore = FAISS.load_local(
-                config.INDEX_PATH, 
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
+            # The store asks the engine for the embeddings only at the first dense
+            # search, so loading the index never waits for the embedding model.
+            vectorstore = VectorStore.load(self.index_path, _EngineEmbeddings(self))
+            vectorstore.set_search_params(nprobe=self.nprobe, ef_search=self.ef_search)
         except Exception as e:
-            print(f"Index not found or error loading: {e}. Please run ingestion first.")
-            self.vectorstore = None
+            logger.error("Index not found or error loading: %s. Please run ingestion first.", e)
+            return None
+        if self.injected_embeddings is None:
+            # Query vectors from another provider/model would search the index silently wrong.
+            embedding_providers.check_index(vectorstore.info, path=vectorstore.path)
+        return vectorstore
+
+    @property
+    def llm(self):
+        return self._component("llm", self._create_llm)
+
+    @property
+    def embeddings(self):
+        """Query embeddings: the provider, batched and cached as configured."""
+        return self._component("embeddings", self._create_embeddings)
+
+    @property
+    def vectorstore(self):
+        """The loaded index, or None when it could not be loaded."""
+        return self._component("vectorstore", self._load_vectorstore)
+
+    @property
+    def retriever(self):
+        return self._component(
+            "retriever", lambda: Retriever(self.vectorstore) if self.vectorstore is not None else None
+        )
+
+    @property
+    def reranker(self):
+        return self._component("reranker", lambda: Reranker(batching=self.batching))
+
+    def _warm_index(self):
+        if self.retriever is not None:
+            self.vectorstore.warmup()
+
+    def _warm_reranker(self):
+        # One tiny prediction also pays the model's first-call setup.
+        if hasattr(self.reranker, "predict"):
+            self.reranker.predict([["warmup", "warmup"]])
 
-        self.reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+    def warmup(self, parallel=True):
+        """Creates every component now instead of on the first request and maps the
+        index files; in parallel threads unless `parallel` is False.
 
-    def initial_retrieval(self, query, top_k=3):
+        Returns the seconds each part took ({"llm", "embeddings", "index", "reranker"}).
+        """
+        tasks = {
+            "llm": lambda: self.llm,
+            "embeddings": lambda: self.embeddings,
+            "index": self._warm_index,
+            "reranker": self._warm_reranker
+        }
+
+        def run(name):
+            start = time.perf_counter()
+            with tracing.span(f"warmup_{name}"):
+                tasks[name]()
+            return name, round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(tasks) if parallel else 1) as pool:
+            timings = dict(pool.map(run, tasks))
+        logger.info("Warmup took %.2fs: %s", time.perf_counter() - start, timings)
+        return timings
+
+    def batcher_stats(self):
+        """Queue depth and batch-size metrics of the cross-request batchers (None when off)."""
+        reranker = self._components.get("reranker")
+        return {
+            "rerank": reranker.batcher.stats() if getattr(reranker, "batcher", None) is not None else None,
+            "query_embedding": self.query_embeddings.batcher.stats() if self.query_embeddings is not None else None
+        }
+
+    def initial_retrieval(self, query, top_k=3, selection=None):
         """Hop 1: Rough retrieval."""
         if not self.vectorstore:
             return []
         
-        docs = self.vectorstore.similarity_search(query, k=top_k)
+        with tracing.span("hop1"):
+            docs = self.retriever.search(query, k=top_k, mode=self.hop1_mode, selection=selection)
+        tracing.count("hop1_candidates", len(docs))
         return docs
 
-    def reformulate_query(self, original_query, context_docs):
-        """Uses LLM to reformulate query based on retrieved docs."""
-        if not context_docs:
-            return original_query
-            
-        context_text = utils.format_docs_with_metadata(context_docs)
-        
+    def hop1_confidence(self, query, docs):
+        """Scores how clearly hop 1 already answers `query`, or None when routing is off.
+
+        "rerank" uses the best CrossEncoder score of the hop-1 docs; "similarity"
+        uses the best cosine similarity between the query embedding and the stored
+        vectors of those docs (no model call beyond the cached query embedding).
+        """
+        if self.router == "off" or not docs:
+            return None
+        with tracing.span("route"):
+            if self.router == "rerank":
+                return float(max(self.reranker.score(query, docs)))
+            rows = [d.metadata["row"] for d in docs]
+            vectors = np.asarray(self.vectorstore.vectors[rows], dtype="float32")
+            query_vector = np.asarray(self.embeddings.embed_query(query), dtype="float32")
+            similarities = vectors @ query_vector / (
+                np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector) + 1e-12
+            )
+            return float(similarities.max())
+
+    def should_skip_reformulation(self, confidence):
+        if confidence is None:
+            return False
+        if self.router == "rerank":
+            return confidence >= config.ROUTER_RERANK_THRESHOLD
+        return confidence >= config.ROUTER_SIMILARITY_THRESHOLD
+
+    def _cached_reformulation(self, original_query, context_docs):
+        """Returns (cache key, cached reformulation or None)."""
+        if self.reformulation_cache is None:
+            return None, None
+        key = reformulation_key(original_query, context_docs, self.llm_model)
+        cached = self.reformulation_cache.get(key)
+        if cached is not None:
+            logger.debug("Reformulation served from cache")
+            tracing.count("reformulation_cache_hits")
+        else:
+            tracing.count("reformulation_cache_misses")
+        return key, cached
+
+    def _context_text(self, docs):
+        """Prompt context for `docs`, packed by context_packer unless CONTEXT_PACKING is off."""
+        if not config.CONTEXT_PACKING:
+            return utils.format_docs_with_metadata(docs)
+        text, stats = context_packer.pack(docs)
+        tracing.count("context_tokens", stats["tokens"])
+        tracing.count("context_tokens_saved", max(0, stats["tokens_saved"]))
+        tracing.count("context_chunks_dropped", stats["chunks"] - stats["chunks_used"])
+        logger.info("Context packed: %d of %d chunks in %d articles, %d tokens (%d saved)",
+                    stats["chunks_used"], stats["chunks"], stats["articles"], stats["tokens"], stats["tokens_saved"])
+        return text
+
+    def _wait_for_llm(self, inputs):
+        """Blocks until the provider's shared rate limit admits a call with these prompt
+        inputs and returns the tokens reserved for it: the prompt estimate plus
+        LLM_COMPLETION_RESERVE, since the provider's TPM limit also counts the
+        completion (<think> block included), or at most the whole TPM bucket.
+        _finish_llm_call settles the difference."""
+        if self.llm_limiter is None:
+            return 0
+        with tracing.span("rate_limit_wait"):
+            return self.llm_limiter.acquire(
+                estimate_tokens("".join(inputs.values())) + config.LLM_COMPLETION_RESERVE
+            )
+
+    def _finish_llm_call(self, reserved, inputs, content, usage=None):
+        """Records a call's token usage and charges the rate limit for what it actually used."""
+        used = _record_llm_usage(inputs, content, usage)
+        if self.llm_limiter is not None:
+            self.llm_limiter.settle(reserved, used)
+
+    def _store_reformulation(self, key, content):
+        cleaned_content = _strip_think(content)
+        if key is not None and cleaned_content:
+            self.reformulation_cache.put(key, cleaned_content)
+        return cleaned_content
+
+    def _reformulation_chain(self):
         template = """
         Role: Ahli Hukum Senior.
         Tugas: Reformulasi pertanyaan awam menjadi QUERY PENCARIAN HUKUM baku.
@@ -82,47 +397,93 @@ class RAGEngine:
 
         Output: Query baku saja.
         """
+        from langchain_core.prompts import PromptTemplate
         prompt = PromptTemplate(
             input_variables=["context_text", "original_query"],
             template=template
         )
-        
-        chain = prompt | self.llm
-        response = chain.invoke({
-            "context_text": context_text,
+        return prompt | self.llm
+
+    def reformulate_query(self, original_query, context_docs):
+        """Uses LLM to reformulate query based on retrieved docs."""
+        if not context_docs:
+            return original_query
+        key, cached = self._cached_reformulation(original_query, context_docs)
+        if cached is not None:
+            return cached
+
+        inputs = {
+            "context_text": self._context_text(context_docs),
             "original_query": original_query
-        })
-        
-        import re
-        content = response.content
-        cleaned_content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
-        
-        return cleaned_content
+        }
+        reserved = self._wait_for_llm(inputs)
+        with tracing.span("reformulate"):
+            response = self._reformulation_chain().invoke(inputs)
+        self._finish_llm_call(reserved, inputs, response.content, getattr(response, "usage_metadata", None))
+        return self._store_reformulation(key, response.content)
 
-    def final_retrieval_and_rerank(self, formulated_query, top_k_initial=15, top_k_final=8):
+    async def areformulate_query(self, original_query, context_docs):
+        """Async reformulate_query (LLM call through `ainvoke`)."""
+        if not context_docs:
+            return original_query
+        key, cached = self._cached_reformulation(original_query, context_docs)
+        if cached is not None:
+            return cached
+
+        inputs = {
+            "context_text": self._context_text(context_docs),
+            "original_query": original_query
+        }
+        reserved = await asyncio.to_thread(self._wait_for_llm, inputs)
+        with tracing.span("reformulate"):
+            response = await self._reformulation_chain().ainvoke(inputs)
+        self._finish_llm_call(reserved, inputs, response.content, getattr(response, "usage_metadata", None))
+        return self._store_reformulation(key, response.content)
+
+    def hop2_depth(self, top_k_initial=15):
+        """Hop-2 candidates retrieved; MMR_POOL (at least) when they are diversified."""
+        return max(top_k_initial, config.MMR_POOL) if self.diversify_candidates else top_k_initial
+
+    def hop2_search(self, query, top_k_initial=15, selection=None):
+        """Hop-2 retrieval, hop2_depth(top_k_initial) candidates deep."""
+        return self.retriever.search(query, k=self.hop2_depth(top_k_initial), mode=self.hop2_mode,
+                                     selection=selection)
+
+    def diversify(self, docs):
+        """The reranker's candidates among hop-2 `docs`: MMR over their stored vectors
+        with a per-article cap (see diversity.select), or `docs` unchanged when off."""
+        if not self.diversify_candidates or len(docs) <= 1:
+            return docs
+        with tracing.span("diversify"):
+            rows = [d.metadata["row"] for d in docs]
+            selected = diversity.select(docs, self.vectorstore.vectors[rows])
+        tracing.count("diversify_dropped", len(docs) - len(selected))
+        return selected
+
+    def final_retrieval_and_rerank(self, formulated_query, top_k_initial=15, top_k_final=8, selection=None):
         """Hop 2: Retrieve with new query and Rerank."""
         if not self.vectorstore:
             return []
 
-        docs = self.vectorstore.similarity_search(formulated_query, k=top_k_initial)
-        
+        with tracing.span("hop2"):
+            docs = self.hop2_search(formulated_query, top_k_initial, selection)
+        tracing.count("hop2_candidates", len(docs))
+        return self.rerank(formulated_query, self.diversify(docs), top_k_final)
+
+    def rerank(self, query, docs, top_k=8):
+        """Orders docs by CrossEncoder score for `query` and keeps the top_k."""
         if not docs:
             return []
 
-        doc_texts = [d.page_content for d in docs]
-        pairs = [[formulated_query, text] for text in doc_texts]
-        
-        scores = self.reranker.predict(pairs)
+        with tracing.span("rerank"):
+            scores = self.reranker.score(query, docs)
         
         doc_score_pairs = list(zip(docs, scores))
         doc_score_pairs.sort(key=lambda x: x[1], reverse=True)
         
-        return [p[0] for p in doc_score_pairs[:top_k_final]]
+        return [p[0] for p in doc_score_pairs[:top_k]]
 
-    def generate_answer(self, query, final_docs):
-        """Generates the final answer."""
-        context_text = utils.format_docs_with_metadata(final_docs)
-        
+    def _answer_chain(self):
         template = """
         Role: Asisten Hukum AI yang Deskriptif dan Tuntas.
         Instruksi: Jawab pertanyaan user secara LENGKAP berdasarkan referensi.
@@ -139,49 +500,232 @@ class RAGEngine:
 
         Pertanyaan: {query}
         """
+        from langchain_core.prompts import PromptTemplate
         prompt = PromptTemplate(
             input_variables=["context_text", "query"],
             template=template
         )
-        
-        chain = prompt | self.llm
-        response = chain.invoke({
-            "context_text": context_text,
+        return prompt | self.llm
+
+    def generate_answer(self, query, final_docs):
+        """Generates the final answer."""
+        inputs = {
+            "context_text": self._context_text(final_docs),
             "query": query
-        })
+        }
+        reserved = self._wait_for_llm(inputs)
+        with tracing.span("generate"):
+            response = self._answer_chain().invoke(inputs)
+        self._finish_llm_call(reserved, inputs, response.content, getattr(response, "usage_metadata", None))
+        return _strip_think(response.content)
+
+    async def agenerate_answer(self, query, final_docs):
+        """Async generate_answer (LLM call through `ainvoke`)."""
+        inputs = {
+            "context_text": self._context_text(final_docs),
+            "query": query
+        }
+        reserved = await asyncio.to_thread(self._wait_for_llm, inputs)
+        with tracing.span("generate"):
+            response = await self._answer_chain().ainvoke(inputs)
+        self._finish_llm_call(reserved, inputs, response.content, getattr(response, "usage_metadata", None))
+        return _strip_think(response.content)
+
+    def _lookup_answer_cache(self, user_query, filters, start_time):
+        """Returns (cached response or None, query embedding used for the semantic lookup)."""
+        if self.answer_cache is None or not self.vectorstore:
+            return None, None
+        query_vector = None
+        build_id = self.vectorstore.build_id
+        with tracing.span("answer_cache"):
+            cached, match = self.answer_cache.get(user_query, build_id, filters)
+            if cached is None and self.answer_cache.semantic:
+                query_vector = self.embeddings.embed_query(user_query)
+                cached, match = self.answer_cache.get(user_query, build_id, filters, vector=query_vector)
+        if cached is None:
+            tracing.count("answer_cache_misses")
+            return None, query_vector
+        tracing.count("answer_cache_hits")
+        logger.info("Answer served from cache (%s match)", match)
+        result = dict(cached, cached=True, cache_match=match, original_query=user_query)
+        result["execution_time"] = round(time.time() - start_time, 2)
+        result["answer_cache"] = self.answer_cache.stats()
+        return result, query_vector
+
+    def _select(self, filters):
+        with tracing.span("filter"):
+            selection = self.vectorstore.select(**filters) if self.vectorstore else None
+        if selection is not None:
+            logger.debug("Filters %s match %d of %d chunks", filters, len(selection), len(self.vectorstore))
+        return selection
+
+    @tracing.traced
+    def process_query(self, user_query, theme=None, tags=None, date_from=None, date_to=None):
+        """Pipeline execution.
+
+        Args:
+            theme: Restrict retrieval to one theme or a list of themes.
+            tags: Restrict retrieval to chunks carrying any of these tags.
+            date_from, date_to: Inclusive publish date range, e.g. "2023" or "2023-06-01".
+
+        The result's "trace" holds per-stage spans and token, candidate and cache counts.
+        """
+        start_time = time.time()
+        filters = {"theme": theme, "tags": tags, "date_from": date_from, "date_to": date_to}
+        cached, query_vector = self._lookup_answer_cache(user_query, filters, start_time)
+        if cached is not None:
+            return cached
+
+        selection = self._select(filters)
+        new_query, final_docs, path, confidence = self._retrieve(user_query, selection)
         
-        import re
-        content = response.content
-        cleaned_content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
+        # 4. Generate
+        logger.info("Generating answer")
+        answer = self.generate_answer(user_query, final_docs)
         
-        return cleaned_content
+        return self._build_result(
+            user_query, new_query, final_docs, answer, path, confidence,
+            filters, selection, query_vector, start_time
+        )
+
+    def checkpoint_settings(self, mode, filters):
+        """Fingerprint of everything that changes a process_queries result besides the
+        query: mode, filters, index build and the retrieval, rerank and LLM settings."""
+        reranker = self.reranker
+        settings = {
+            "mode": mode,
+            "filters": filters,
+            "build_id": self.vectorstore.build_id if self.vectorstore else None,
+            "hop1_mode": self.hop1_mode,
+            "hop2_mode": self.hop2_mode,
+            "router": self.router,
+            "router_thresholds": [config.ROUTER_RERANK_THRESHOLD, config.ROUTER_SIMILARITY_THRESHOLD],
+            "diversify": [self.diversify_candidates, config.MMR_POOL, config.MMR_CANDIDATES,
+                          config.MMR_MAX_PER_ARTICLE, config.MMR_LAMBDA],
+            "reranker": [getattr(reranker, "model_name", type(reranker).__name__),
+                         getattr(reranker, "backend", None), getattr(reranker, "max_length", None)],
+            "llm_model": self.llm_model,
+            "prompt_version": config.REFORMULATION_PROMPT_VERSION,
+            "context": [config.CONTEXT_PACKING, config.CONTEXT_TOKEN_BUDGET]
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
 
-    def process_query(self, user_query):
-        """Pipeline execution."""
+    def process_queries(self, queries, concurrency=None, checkpoint_path=None, mode="answer",
+                        theme=None, tags=None, date_from=None, date_to=None):
+        """Runs many queries concurrently and returns their results in input order.
+
+        Args:
+            concurrency: Queries in flight at once (default QUERY_CONCURRENCY). LLM
+                calls are paced by the shared per-provider rate limit, not by sleeps.
+            checkpoint_path: JSONL file every finished query is appended to. Queries
+                already in it with the same settings (see checkpoint_settings) are not
+                run again, so an interrupted run resumes where it stopped; failed
+                queries are retried.
+            mode: "answer" runs process_query; "retrieval" stops after hop 2 (no
+                answer generation), for retrieval evaluation.
+            theme, tags, date_from, date_to: Filters applied to every query.
+
+        Results have final_docs as Documents whether they were just computed or read
+        back from the checkpoint. A failed query gives {"original_query", "error"}.
+        """
+        if mode not in ("answer", "retrieval"):
+            raise ValueError(f"Unknown mode '{mode}'. Choose one of: answer, retrieval.")
+        filters = {"theme": theme, "tags": tags, "date_from": date_from, "date_to": date_to}
+        settings = self.checkpoint_settings(mode, filters)
+        done = _read_checkpoint(checkpoint_path, settings) if checkpoint_path else {}
+
+        results = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            if query in done:
+                results[i] = _load_result(done[query])
+            else:
+                pending.append(i)
+        if len(pending) < len(queries):
+            logger.info("Resuming: %d of %d queries found in %s", len(queries) - len(pending), len(queries), checkpoint_path)
+
+        def run(query):
+            record = {"query": query, "settings": settings}
+            for attempt in range(config.LLM_MAX_RETRIES + 1):
+                try:
+                    if mode == "answer":
+                        result = self.process_query(query, **filters)
+                    else:
+                        result = self._retrieval_result(query, filters)
+                    record["result"] = _dump_result(result)
+                except Exception as e:
+                    if _is_rate_limit_error(e) and attempt < config.LLM_MAX_RETRIES:
+                        # The shared limiter only approximates the provider's quota.
+                        delay = min(60.0, (2 ** attempt) + random.uniform(0, 1))
+                        tracing.count("llm_rate_limit_retries")
+                        logger.warning("Rate limited on '%s'; retrying in %.1fs", query[:60], delay)
+                        time.sleep(delay)
+                        continue
+                    logger.error("Error processing '%s': %s", query, e)
+                    record["error"] = str(e)
+                break
+            return json.dumps(record, ensure_ascii=False, default=_json_default)
+
+        concurrency = concurrency or config.QUERY_CONCURRENCY
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(run, queries[i]): i for i in pending}
+            for finished, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                line = future.result()
+                if checkpoint_path:
+                    with open(checkpoint_path, 'a', encoding='utf-8') as f:
+                        f.write(line + "\n")
+                record = json.loads(line)
+                if "result" in record:
+                    results[i] = _load_result(record["result"])
+                else:
+                    results[i] = {"original_query": queries[i], "error": record["error"]}
+                logger.info("[%d/%d] Done: %s", finished, len(pending), queries[i][:60])
+        return results
+
+    @tracing.traced
+    def _retrieval_result(self, user_query, filters):
+        """process_query without answer generation (or the answer cache)."""
         start_time = time.time()
-        
+        new_query, final_docs, path, confidence = self._retrieve(user_query, self._select(filters))
+        return {
+            "original_query": user_query,
+            "reformulated_query": new_query,
+            "final_docs": final_docs,
+            "execution_time": round(time.time() - start_time, 2),
+            "path": path,
+            "hop1_confidence": confidence
+        }
+
+    def _retrieve(self, user_query, selection):
+        """Hop 1, routing, reformulation and hop 2: returns (new_query, final_docs, path, confidence)."""
         # 1. Hop 1
-        print("--- Hop 1: Initial Retrieval ---")
-        initial_docs = self.initial_retrieval(user_query)
-        print(f"DEBUG: Found {len(initial_docs)} docs in Hop 1")
+        logger.info("Hop 1: initial retrieval")
+        initial_docs = self.initial_retrieval(user_query, selection=selection)
+        logger.debug("Found %d docs in Hop 1", len(initial_docs))
         
-        # 2. Reformulate
-        print("--- Reformulating Query ---")
-        new_query = self.reformulate_query(user_query, initial_docs)
-        print(f"DEBUG: Reformulated Query: {new_query}")
+        # 2. Route: skip reformulation when hop 1 is already confident
+        confidence = self.hop1_confidence(user_query, initial_docs)
+        if self.should_skip_reformulation(confidence):
+            path = "direct"
+            new_query = user_query
+            logger.info("Hop 1 confident (%.3f), skipping reformulation", confidence)
+        else:
+            path = "double_hop"
+            logger.info("Reformulating query")
+            new_query = self.reformulate_query(user_query, initial_docs)
+            logger.debug("Reformulated query: %s", new_query)
         
         # 3. Hop 2 & Rerank
-        print("--- Hop 2: Final Retrieval & Rerank ---")
-        final_docs = self.final_retrieval_and_rerank(new_query)
-        print(f"DEBUG: Found {len(final_docs)} final docs")
+        logger.info("Hop 2: final retrieval & rerank")
+        final_docs = self.final_retrieval_and_rerank(new_query, selection=selection)
+        logger.debug("Found %d final docs", len(final_docs))
         for i, d in enumerate(final_docs[:3]):
-            print(f"DEBUG: Top Doc {i+1}: {d.metadata.get('title', 'No Title')}")
-        
-        # 4. Generate
-        print("--- Generating Answer ---")
-        answer = self.generate_answer(user_query, final_docs)
-        
-        # 5. Extract References (Deduplicated)
+            logger.debug("Top doc %d: %s", i + 1, d.metadata.get('title', 'No Title'))
+        return new_query, final_docs, path, confidence
+
+    def _references(self, final_docs):
+        """Deduplicated reference list for the final docs."""
         references = []
         seen_urls = set()
         for d in final_docs:
@@ -197,15 +741,219 @@ class RAGEngine:
                 "theme": d.metadata.get("theme", "General")
             }
             references.append(ref)
+        return references
+
+    def _build_result(self, user_query, new_query, final_docs, answer, path, confidence,
+                      filters, selection, query_vector, start_time):
+        # 5. Extract References (Deduplicated)
+        references = self._references(final_docs)
 
         execution_time = round(time.time() - start_time, 2)
-        print(f"--- Pipeline Finished in {execution_time}s ---")
+        logger.info("Pipeline finished in %ss", execution_time)
+        tracing.count("final_docs", len(final_docs))
 
-        return {
+        result = {
             "original_query": user_query,
             "reformulated_query": new_query,
             "final_docs": final_docs,
             "answer": answer,
             "references": references,
-            "execution_time": execution_time
+            "execution_time": execution_time,
+            "path": path,
+            "hop1_confidence": confidence,
+            "cached": False
         }
+        if selection is not None:
+            result["filters"] = {key: value for key, value in filters.items() if value}
+        if self.answer_cache is not None and self.vectorstore:
+            self.answer_cache.put(user_query, self.vectorstore.build_id, dict(result), filters, vector=query_vector)
+            result["answer_cache"] = self.answer_cache.stats()
+        result["reranker"] = self.reranker.stats()
+        if self.query_embeddings is not None:
+            result["batching"] = self.batcher_stats()
+        if self.reformulation_cache is not None:
+            result["reformulation_cache"] = self.reformulation_cache.stats()
+        if self.embedding_cache is not None:
+            result["embedding_cache"] = self.embedding_cache.stats()
+            logger.debug("Embedding cache %s", result['embedding_cache'])
+        return result
+
+    def stream_query(self, user_query, theme=None, tags=None, date_from=None, date_to=None):
+        """Streaming process_query: yields events as the pipeline progresses.
+
+        Events are dicts with a "type":
+            "meta"  - original/reformulated query, references, path, before generation
+            "token" - a piece of the answer ("text"), <think> blocks already removed
+            "done"  - execution_time and ttft (seconds to the first answer token)
+        A cached answer is sent as a single token event. "done" also carries the
+        request's trace (see process_query).
+        """
+        # The generator may be resumed from different threads (e.g. a server's
+        # thread pool), so the trace is activated around each stretch of work
+        # instead of once for the whole generator.
+        trace = tracing.Trace()
+        start_time = time.time()
+        filters = {"theme": theme, "tags": tags, "date_from": date_from, "date_to": date_to}
+        with tracing.use(trace):
+            cached, query_vector = self._lookup_answer_cache(user_query, filters, start_time)
+        if cached is not None:
+            yield self._meta_event(cached)
+            yield {"type": "token", "text": cached["answer"]}
+            ttft = round(time.time() - start_time, 3)
+            trace.add_span("request", trace.started, time.perf_counter())
+            yield {"type": "done", "execution_time": cached["execution_time"], "ttft": ttft, "cached": True,
+                   "trace": trace.to_dict()}
+            return
+
+        with tracing.use(trace):
+            selection = self._select(filters)
+            new_query, final_docs, path, confidence = self._retrieve(user_query, selection)
+        yield self._meta_event({
+            "original_query": user_query,
+            "reformulated_query": new_query,
+            "references": self._references(final_docs),
+            "path": path,
+            "hop1_confidence": confidence,
+            "cached": False
+        })
+
+        logger.info("Generating answer (streaming)")
+        think_filter = utils.ThinkFilter()
+        parts = []
+        ttft = None
+        usage = {}
+        with tracing.use(trace):
+            inputs = {
+                "context_text": self._context_text(final_docs),
+                "query": user_query
+            }
+            reserved = self._wait_for_llm(inputs)
+        generation_start = time.perf_counter()
+        stream = self._answer_chain().stream(inputs)
+        for chunk in stream:
+            for key, value in (getattr(chunk, "usage_metadata", None) or {}).items():
+                if key in ("input_tokens", "output_tokens"):
+                    usage[key] = usage.get(key, 0) + value
+            text = think_filter.feed(chunk.content)
+            if text:
+                if ttft is None:
+                    ttft = round(time.time() - start_time, 3)
+                    trace.add_span("ttft", trace.started, time.perf_counter())
+                    logger.debug("Time to first token %ss", ttft)
+                parts.append(text)
+                yield {"type": "token", "text": text}
+        text = think_filter.flush()
+        if text:
+            parts.append(text)
+            yield {"type": "token", "text": text}
+        trace.add_span("generate", generation_start, time.perf_counter())
+
+        answer = "".join(parts).strip()
+        with tracing.use(trace):
+            self._finish_llm_call(reserved, inputs, answer, usage)
+            result = self._build_result(
+                user_query, new_query, final_docs, answer, path, confidence,
+                filters, selection, query_vector, start_time
+            )
+        trace.add_span("request", trace.started, time.perf_counter())
+        yield {"type": "done", "execution_time": result["execution_time"], "ttft": ttft, "cached": False,
+               "trace": trace.to_dict()}
+
+    def _meta_event(self, result):
+        event = {"type": "meta"}
+        for key in ("original_query", "reformulated_query", "references", "path", "hop1_confidence", "cached"):
+            event[key] = result.get(key)
+        return event
+
+    def _speculative_hop2(self, user_query, selection, top_k_initial=15):
+        """Hop-2 candidates for the original query, retrieved while the reformulation
+        LLM call is still in flight (reranked only if they end up being used)."""
+        with tracing.span("speculative_hop2"):
+            candidates = self.hop2_search(user_query, top_k_initial, selection)
+        tracing.count("speculative_candidates", len(candidates))
+        return candidates
+
+    def _reused_hop2(self, user_query, speculative_candidates, top_k_final=8):
+        """Hop 2 when the reformulation left the query unchanged: the speculative
+        candidates are exactly what final_retrieval_and_rerank would retrieve."""
+        tracing.count("hop2_candidates", len(speculative_candidates))
+        return self.rerank(user_query, self.diversify(speculative_candidates), top_k_final)
+
+    def _merged_hop2(self, new_query, speculative_candidates, selection, top_k_initial=15, top_k_final=8):
+        """Hop 2 for the reformulated query, with the speculative candidates fused in.
+
+        Both rankings are fused with RRF and cut to the usual hop-2 depth, so the
+        reranker scores as many candidates as in final_retrieval_and_rerank.
+        """
+        with tracing.span("hop2"):
+            docs = self.hop2_search(new_query, top_k_initial, selection)
+        by_id = {}
+        for d in speculative_candidates + docs:
+            by_id[d.metadata.get("chunk_id")] = d
+        fused = reciprocal_rank_fusion([
+            [d.metadata.get("chunk_id") for d in docs],
+            [d.metadata.get("chunk_id") for d in speculative_candidates]
+        ])
+        docs = [by_id[chunk_id] for chunk_id in fused[:self.hop2_depth(top_k_initial)]]
+        tracing.count("hop2_candidates", len(docs))
+        return self.rerank(new_query, self.diversify(docs), top_k_final)
+
+    @tracing.traced
+    async def aprocess_query(self, user_query, theme=None, tags=None, date_from=None, date_to=None):
+        """Async process_query with the same arguments and result.
+
+        LLM calls go through `ainvoke`; retrieval and reranking run in worker threads.
+        While the reformulation is in flight, hop 2 is run speculatively for the
+        original query (retrieval only): its candidates are reranked as they are when
+        the reformulation comes back unchanged, otherwise fused into the hop-2 pool.
+        """
+        if not self.vectorstore:
+            return await asyncio.to_thread(
+                self.process_query, user_query, theme, tags, date_from, date_to
+            )
+        start_time = time.time()
+        filters = {"theme": theme, "tags": tags, "date_from": date_from, "date_to": date_to}
+        cached, query_vector = await asyncio.to_thread(self._lookup_answer_cache, user_query, filters, start_time)
+        if cached is not None:
+            return cached
+
+        selection = await asyncio.to_thread(self._select, filters)
+
+        logger.info("Hop 1: initial retrieval")
+        initial_docs = await asyncio.to_thread(self.initial_retrieval, user_query, 3, selection)
+        logger.debug("Found %d docs in Hop 1", len(initial_docs))
+
+        confidence = await asyncio.to_thread(self.hop1_confidence, user_query, initial_docs)
+        if self.should_skip_reformulation(confidence):
+            path = "direct"
+            new_query = user_query
+            logger.info("Hop 1 confident (%.3f), skipping reformulation", confidence)
+            final_docs = await asyncio.to_thread(self.final_retrieval_and_rerank, user_query, 15, 8, selection)
+        else:
+            path = "double_hop"
+            logger.info("Reformulating query (speculative Hop 2 running)")
+            speculative = asyncio.ensure_future(asyncio.to_thread(self._speculative_hop2, user_query, selection))
+            try:
+                new_query = await self.areformulate_query(user_query, initial_docs)
+            finally:
+                # Never leave the worker thread orphaned, even if the LLM call failed.
+                (speculative_result,) = await asyncio.gather(speculative, return_exceptions=True)
+            logger.debug("Reformulated query: %s", new_query)
+            if isinstance(speculative_result, Exception):
+                logger.warning("Speculative Hop 2 failed (%s); running it for the new query", speculative_result)
+                final_docs = await asyncio.to_thread(self.final_retrieval_and_rerank, new_query, 15, 8, selection)
+            elif normalize_query(new_query) == normalize_query(user_query):
+                logger.info("Hop 2: reusing speculative results")
+                tracing.count("speculative_hop2_reused")
+                final_docs = await asyncio.to_thread(self._reused_hop2, user_query, speculative_result)
+            else:
+                logger.info("Hop 2: final retrieval & rerank (fused with speculative candidates)")
+                final_docs = await asyncio.to_thread(self._merged_hop2, new_query, speculative_result, selection)
+        logger.debug("Found %d final docs", len(final_docs))
+
+        logger.info("Generating answer")
+        answer = await self.agenerate_answer(user_query, final_docs)
+        return self._build_result(
+            user_query, new_query, final_docs, answer, path, confidence,
+            filters, selection, query_vector, start_time
+        )
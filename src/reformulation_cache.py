@@ -0,0 +1,45 @@
+import hashlib
+from . import config
+from .answer_cache import normalize_query
+from .cache import SQLiteCache
+
+def cache_key(query, context_docs, model, prompt_version=None):
+    """Key for one reformulation: normalized query, hop-1 chunk IDs (in rank order),
+    prompt version, context packing settings and model, so a new index, prompt,
+    prompt context or model never reuses old output."""
+    chunk_ids = [str(d.metadata.get("chunk_id") or d.page_content) for d in context_docs]
+    version = config.REFORMULATION_PROMPT_VERSION if prompt_version is None else prompt_version
+    # The packed context differs from the plain one and depends on the budget.
+    packing = f"packed:{config.CONTEXT_TOKEN_BUDGET}" if config.CONTEXT_PACKING else "plain"
+    parts = [normalize_query(query), "\x01".join(chunk_ids), str(version), packing, str(model)]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+class ReformulationCache:
+    """Reformulated queries stored as UTF-8 text in a SQLiteCache."""
+
+    def __init__(self, path=None, max_entries=None):
+        self.store = SQLiteCache(
+            path or config.REFORMULATION_CACHE_PATH,
+            max_entries=config.REFORMULATION_CACHE_MAX_ENTRIES if max_entries is None else max_entries,
+            table="reformulations"
+        )
+
+    def get(self, key):
+        value = self.store.get(key)
+        return None if value is None else bytes(value).decode("utf-8")
+
+    def put(self, key, reformulated_query):
+        self.store.put(key, reformulated_query.encode("utf-8"))
+
+    @property
+    def hits(self):
+        return self.store.hits
+
+    def stats(self):
+        return self.store.stats()
+
+def get_reformulation_cache():
+    """Shared cache from config, or None when REFORMULATION_CACHE_PATH is empty."""
+    if not config.REFORMULATION_CACHE_PATH:
+        return None
+    return ReformulationCache()
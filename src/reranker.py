@@ -0,0 +1,103 @@
+import functools
+import threading
+from collections import OrderedDict
+from . import config, tracing
+from .batcher import DynamicBatcher
+
+BACKENDS = ("torch", "onnx", "int8")
+
+@functools.lru_cache(maxsize=None)
+def load_cross_encoder(model_name, backend, max_length):
+    """CrossEncoder for the backend.
+
+    "torch" is the stock PyTorch model, "int8" the same model with its Linear
+    layers dynamically quantized to int8, and "onnx" runs it in ONNX Runtime
+    (needs sentence-transformers >= 4.1 with the onnx extra installed).
+
+    Loaded once per process: every Reranker shares it, and so do server
+    workers forked after src/server.py preloads it.
+    """
+    from sentence_transformers import CrossEncoder
+    if backend == "onnx":
+        try:
+            return CrossEncoder(model_name, max_length=max_length, device="cpu", backend="onnx")
+        except TypeError as e:
+            raise ValueError(
+                "The onnx reranker backend needs sentence-transformers>=4.1: "
+                "pip install 'sentence-transformers[onnx]'"
+            ) from e
+    model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+    if backend == "int8":
+        import torch
+        model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+class Reranker:
+    """Cross-encoder scoring with a selectable backend and a (query, chunk_id) score cache."""
+
+    def __init__(self, model_name=None, backend=None, max_length=None, batch_size=None, cache_size=None,
+                 batching=None):
+        self.model_name = model_name or config.RERANKER_MODEL
+        self.backend = backend or config.RERANKER_BACKEND
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown reranker backend '{self.backend}'. Choose one of: {', '.join(BACKENDS)}.")
+        self.max_length = max_length or config.RERANKER_MAX_LENGTH
+        self.batch_size = batch_size or config.RERANKER_BATCH_SIZE
+        self.cache_size = config.RERANKER_CACHE_SIZE if cache_size is None else cache_size
+        self.model = load_cross_encoder(self.model_name, self.backend, self.max_length)
+        # With batching on, pairs from concurrent requests are scored in shared batches.
+        batching = config.BATCHING_ENABLED if batching is None else batching
+        self.batcher = DynamicBatcher(self._predict, name="rerank") if batching else None
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _predict(self, pairs):
+        return [float(s) for s in self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)]
+
+    def predict(self, pairs):
+        """Uncached scores for [query, text] pairs (same contract as CrossEncoder.predict)."""
+        if not pairs:
+            return []
+        if self.batcher is not None:
+            return self.batcher.submit(pairs)
+        return self._predict(pairs)
+
+    def score(self, query, docs):
+        """Scores for each doc against `query`; only uncached (query, chunk_id) pairs hit the model."""
+        keys = [(query, d.metadata.get("chunk_id")) for d in docs]
+        scores = [None] * len(docs)
+        missing = []
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key[1] is not None and key in self.cache:
+                    self.cache.move_to_end(key)
+                    scores[i] = self.cache[key]
+                else:
+                    missing.append(i)
+            self.hits += len(docs) - len(missing)
+            self.misses += len(missing)
+        tracing.count("reranker_cache_hits", len(docs) - len(missing))
+        tracing.count("reranker_pairs_scored", len(missing))
+
+        with tracing.span("cross_encoder"):
+            new_scores = self.predict([[query, docs[i].page_content] for i in missing])
+        with self.lock:
+            for i, value in zip(missing, new_scores):
+                scores[i] = value
+                if keys[i][1] is not None and self.cache_size:
+                    self.cache[keys[i]] = value
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return scores
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self.cache)
+        }
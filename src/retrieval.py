@@ -0,0 +1,64 @@
+import logging
+from . import config, tracing
+
+logger = logging.getLogger(__name__)
+
+MODES = ("dense", "bm25", "hybrid")
+
+def reciprocal_rank_fusion(rankings, k=None):
+    """Fuses ranked lists of row numbers: score(row) = sum of 1 / (k + rank).
+
+    Returns rows ordered by fused score; ties keep first-seen order.
+    """
+    k = config.RRF_K if k is None else k
+    scores = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class Retriever:
+    """Dense, BM25 or hybrid search over a VectorStore, returning Documents."""
+
+    def __init__(self, vectorstore):
+        self.vectorstore = vectorstore
+        self.bm25 = vectorstore.bm25
+        if self.bm25 is None:
+            logger.warning("No BM25 index found next to the vector index; falling back to dense retrieval. "
+                           "Reindex to enable keyword search.")
+
+    def resolve_mode(self, mode):
+        if mode not in MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'. Choose one of: {', '.join(MODES)}.")
+        return "dense" if self.bm25 is None else mode
+
+    def dense_rows(self, query, k, selection=None):
+        with tracing.span("embed_query"):
+            vector = self.vectorstore.embeddings.embed_query(query)
+        with tracing.span("vector_search"):
+            rows, _ = self.vectorstore.search_by_vector(vector, k, selection=selection)
+        return [int(r) for r in rows]
+
+    def bm25_rows(self, query, k, selection=None):
+        with tracing.span("bm25_search"):
+            rows, _ = self.bm25.search(query, k, rows=None if selection is None else selection.rows)
+        return [int(r) for r in rows]
+
+    def search_rows(self, query, k, mode, selection=None):
+        """Row numbers of the top k chunks; `selection` (from VectorStore.select) restricts the search."""
+        if selection is not None and len(selection) == 0:
+            return []
+        mode = self.resolve_mode(mode)
+        if mode == "dense":
+            return self.dense_rows(query, k, selection)
+        if mode == "bm25":
+            return self.bm25_rows(query, k, selection)
+        depth = max(k, config.HYBRID_CANDIDATES)
+        fused = reciprocal_rank_fusion([
+            self.dense_rows(query, depth, selection),
+            self.bm25_rows(query, depth, selection)
+        ])
+        return fused[:k]
+
+    def search(self, query, k=4, mode="hybrid", selection=None):
+        return self.vectorstore.chunks.documents(self.search_rows(query, k, mode, selection))
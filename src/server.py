@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import List, Optional
+from pydantic import BaseModel
+from . import config, tracing, utils
+
+logger = logging.getLogger(__name__)
+
+class QueryRequest(BaseModel):
+    query: str
+    theme: Optional[str] = None
+    tags: Optional[List[str]] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+
+class Overloaded(Exception):
+    pass
+
+class Admission:
+    """Bounded admission of one worker's requests.
+
+    At most `concurrency` requests run at once and up to `queue_size` more wait
+    for a slot; acquire() raises Overloaded beyond that, so clients are told to
+    back off (429) instead of piling up behind a queue they would time out in.
+    """
+
+    def __init__(self, concurrency=None, queue_size=None):
+        self.concurrency = concurrency or config.SERVER_CONCURRENCY
+        self.queue_size = config.SERVER_QUEUE_SIZE if queue_size is None else queue_size
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self.running >= self.concurrency and self.waiting >= self.queue_size:
+            self.rejected += 1
+            tracing.count("server_rejected")
+            raise Overloaded()
+        self.waiting += 1
+        try:
+            with tracing.span("queue_wait"):
+                await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self.semaphore.release()
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
+
+def create_engine(offline=False):
+    """The configured RAGEngine, or with offline=True one on the offline index with
+    the stand-in LLM and embeddings of src/offline.py (real reranker; no API keys)."""
+    from .rag_engine import RAGEngine
+    if not offline:
+        return RAGEngine(batching=True)
+    from . import offline as stand_ins
+    engine = RAGEngine(
+        batching=True, llm=stand_ins.canned_llm({}), embeddings=stand_ins.HashingEmbeddings(),
+        index_path=config.OFFLINE_INDEX_PATH
+    )
+    engine.answer_cache = None
+    engine.reformulation_cache = None
+    return engine
+
+def create_app(engine_factory=create_engine, concurrency=None, queue_size=None, timeout=None):
+    """FastAPI app whose engine is built (by `engine_factory`) and warmed up at startup."""
+    from contextlib import asynccontextmanager
+    import anyio
+    from fastapi import FastAPI, HTTPException
+    from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+    timeout = config.SERVER_REQUEST_TIMEOUT if timeout is None else timeout
+    state = {"engine": None, "admission": None}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        state["admission"] = Admission(concurrency, queue_size)
+        engine = await asyncio.to_thread(engine_factory)
+        await asyncio.to_thread(engine.warmup)
+        state["engine"] = engine
+        logger.info("Worker %d ready", os.getpid())
+        yield
+
+    app = FastAPI(title="Legal RAG", lifespan=lifespan)
+
+    def busy():
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Server busy, retry later."},
+            headers={"Retry-After": "1"}
+        )
+
+    @app.post("/query")
+    async def query(request: QueryRequest):
+        admission = state["admission"]
+        deadline = time.monotonic() + timeout
+        try:
+            await asyncio.wait_for(admission.acquire(), timeout)
+        except Overloaded:
+            return busy()
+        except asyncio.TimeoutError:
+            tracing.count("server_timeouts")
+            raise HTTPException(status_code=504, detail="Timed out waiting for a free slot.")
+        task = asyncio.ensure_future(state["engine"].aprocess_query(
+            request.query,
+            theme=request.theme,
+            tags=request.tags,
+            date_from=request.date_from,
+            date_to=request.date_to
+        ))
+
+        def finished(task):
+            # The slot is held until the pipeline has really finished: stages
+            # running in worker threads cannot be cancelled, so after a timeout
+            # they keep working and must keep counting against the limit.
+            admission.release()
+            if not task.cancelled():
+                task.exception()  # retrieved here when nobody awaits it anymore
+
+        task.add_done_callback(finished)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            tracing.count("server_timeouts")
+            raise HTTPException(status_code=504, detail=f"Query took longer than {timeout}s.")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @app.post("/query/stream")
+    async def query_stream(request: QueryRequest):
+        """Server-sent events as in modal_app.web_query_stream; the slot is held until
+        the stream ends and the timeout only bounds the wait for it."""
+        admission = state["admission"]
+        try:
+            await asyncio.wait_for(admission.acquire(), timeout)
+        except Overloaded:
+            return busy()
+        except asyncio.TimeoutError:
+            tracing.count("server_timeouts")
+            raise HTTPException(status_code=504, detail="Timed out waiting for a free slot.")
+
+        events = state["engine"].stream_query(
+            request.query,
+            theme=request.theme,
+            tags=request.tags,
+            date_from=request.date_from,
+            date_to=request.date_to
+        )
+
+        async def stream():
+            step = None
+            try:
+                while True:
+                    step = asyncio.ensure_future(asyncio.to_thread(next, events, None))
+                    event = await asyncio.shield(step)
+                    if event is None:
+                        break
+                    yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+            finally:
+                # Also reached when the client disconnects mid-stream: once the
+                # step in flight is done, close the generator so that the LLM
+                # stream it holds is closed. Shielded, since the response's
+                # cancelled scope would otherwise cancel these awaits as well.
+                with anyio.CancelScope(shield=True):
+                    if step is not None:
+                        await asyncio.wait([step])
+                    await asyncio.to_thread(events.close)
+                admission.release()
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "pid": os.getpid(), "admission": state["admission"].stats()}
+
+    @app.get("/batching-stats")
+    async def batching_stats():
+        return state["engine"].batcher_stats()
+
+    @app.get("/metrics")
+    async def metrics():
+        """Prometheus text format for the worker that answers (scrape each one, or run one worker)."""
+        return PlainTextResponse(tracing.METRICS.render(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+def preload(offline=False):
+    """Loads the model weights in the parent so forked workers share them copy-on-write."""
+    from . import embedding_providers, reranker
+    if config.EMBEDDING_PROVIDER == "local" and not offline:
+        embedding_providers.load_sentence_transformer(config.LOCAL_EMBEDDING_MODEL, config.LOCAL_EMBEDDING_BACKEND)
+    reranker.load_cross_encoder(config.RERANKER_MODEL, config.RERANKER_BACKEND, config.RERANKER_MAX_LENGTH)
+
+def share_rate_limits(workers):
+    """Splits the LLM provider rate limits between workers, whose limiters are per process."""
+    for name in ("GROQ_RPM", "GROQ_TPM", "GEMINI_RPM", "GEMINI_TPM"):
+        limit = getattr(config, name)
+        if limit:
+            setattr(config, name, max(1, limit // workers))
+
+def run_worker(sock, workers, offline, concurrency, queue_size, timeout):
+    import uvicorn
+    if workers > 1 and "torch" in sys.modules:
+        # Without this every worker would start one thread per core.
+        sys.modules["torch"].set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    app = create_app(lambda: create_engine(offline), concurrency, queue_size, timeout)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=config.LOG_LEVEL.lower()))
+    server.run(sockets=[sock])
+
+def serve(host=None, port=None, workers=None, offline=False, concurrency=None, queue_size=None,
+          timeout=None, preload_models=True):
+    """Serves the Modal app's endpoints without Modal: `python -m src.server --workers 4`.
+
+    Each worker process runs an event loop with its own engine and accepts on the
+    same listening socket; requests go through RAGEngine.aprocess_query, so a
+    slow LLM call only holds its own concurrency slot. With several workers the
+    parent loads the model weights once and forks, so the workers share them
+    copy-on-write; the index is shared through its memory-mapped files (see
+    vector_store.py). Several workers need os.fork() (POSIX).
+    """
+    host = host or config.SERVER_HOST
+    port = port or config.SERVER_PORT
+    workers = workers or config.SERVER_WORKERS
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    logger.info("Serving on http://%s:%d with %d worker(s)", host, port, workers)
+    if workers == 1:
+        run_worker(sock, workers, offline, concurrency, queue_size, timeout)
+        return
+    if not hasattr(os, "fork"):
+        raise ValueError("Several workers need os.fork(); run with --workers 1 on this platform.")
+
+    share_rate_limits(workers)
+    if preload_models:
+        # Only weights are loaded here: no engine, no threads and no SQLite
+        # connections, none of which survive a fork.
+        preload(offline)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(sock, workers, offline, concurrency, queue_size, timeout)
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        while True:
+            try:
+                os.waitpid(pid, 0)
+                break
+            except InterruptedError:
+                continue
+    sock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self-hosted RAG HTTP server")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS, help="Worker processes")
+    parser.add_argument("--concurrency", type=int, default=config.SERVER_CONCURRENCY,
+                        help="Pipelines running at once per worker")
+    parser.add_argument("--queue-size", type=int, default=config.SERVER_QUEUE_SIZE,
+                        help="Requests waiting per worker before 429")
+    parser.add_argument("--timeout", type=float, default=config.SERVER_REQUEST_TIMEOUT,
+                        help="Seconds before 504, queue wait included")
+    parser.add_argument("--offline", action="store_true",
+                        help="Offline index with stand-in LLM and embeddings (for load tests, no API keys)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Let each worker load its own model copy instead of sharing the parent's")
+    args = parser.parse_args()
+
+    utils.setup_logging()
+    serve(args.host, args.port, args.workers, args.offline, args.concurrency, args.queue_size,
+          args.timeout, preload_models=not args.no_preload)
@@ -0,0 +1,149 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("rag_trace", default=None)
+
+class Metrics:
+    """Process-wide stage latency histograms and event counters, rendered in the
+    Prometheus text exposition format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}  # stage -> [per-bucket counts..., +Inf count]
+        self.sums = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            counts = self.histograms.setdefault(stage, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self.sums[stage] = self.sums.get(stage, 0.0) + seconds
+
+    def inc(self, event, amount=1):
+        with self.lock:
+            self.counters[event] = self.counters.get(event, 0) + amount
+
+    def render(self):
+        with self.lock:
+            lines = [
+                "# HELP rag_stage_duration_seconds Time spent in each RAG pipeline stage.",
+                "# TYPE rag_stage_duration_seconds histogram"
+            ]
+            for stage in sorted(self.histograms):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), self.histograms[stage]):
+                    cumulative += count
+                    lines.append(f'rag_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'rag_stage_duration_seconds_sum{{stage="{stage}"}} {self.sums[stage]:.6f}')
+                lines.append(f'rag_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+            lines += [
+                "# HELP rag_events_total Tokens, candidates and cache hits counted by the RAG pipeline.",
+                "# TYPE rag_events_total counter"
+            ]
+            for event in sorted(self.counters):
+                lines.append(f'rag_events_total{{event="{event}"}} {self.counters[event]}')
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+class Trace:
+    """Spans and counts of one request, returned in its response as `trace`."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add_span(self, name, start, end):
+        with self.lock:
+            self.spans.append({
+                "name": name,
+                "start_ms": round((start - self.started) * 1000, 2),
+                "duration_ms": round((end - start) * 1000, 2)
+            })
+        METRICS.observe(name, end - start)
+
+    def count(self, event, amount=1):
+        with self.lock:
+            self.counts[event] = self.counts.get(event, 0) + amount
+        METRICS.inc(event, amount)
+
+    def to_dict(self):
+        with self.lock:
+            return {"spans": list(self.spans), "counts": dict(self.counts)}
+
+def current():
+    """The Trace of the request running in this context, or None."""
+    return _current.get()
+
+@contextmanager
+def use(trace):
+    """Makes `trace` the current one; contexts copied from here on (asyncio tasks,
+    asyncio.to_thread) record into it too."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def span(name):
+    """Times the block as stage `name` of the current trace (histogram only without one)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        trace = _current.get()
+        if trace is not None:
+            trace.add_span(name, start, end)
+        else:
+            METRICS.observe(name, end - start)
+
+def count(event, amount=1):
+    """Adds to counter `event` of the current trace and the process-wide metrics."""
+    if not amount:
+        return
+    trace = _current.get()
+    if trace is not None:
+        trace.count(event, amount)
+    else:
+        METRICS.inc(event, amount)
+
+def traced(fn):
+    """Runs `fn` (sync or async, returning a result dict) in a fresh Trace, timed as
+    stage "request", and adds the trace to the result under "trace"."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            trace = Trace()
+            with use(trace):
+                with span("request"):
+                    result = await fn(*args, **kwargs)
+            result["trace"] = trace.to_dict()
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        trace = Trace()
+        with use(trace):
+            with span("request"):
+                result = fn(*args, **kwargs)
+        result["trace"] = trace.to_dict()
+        return result
+    return wrapper
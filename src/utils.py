@@ -1,3 +1,11 @@
+import logging
+from . import config
+
+def setup_logging(level=None):
+    """Console logging for entry points: LOG_LEVEL for the pipeline, WARNING for libraries."""
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("src").setLevel(level or config.LOG_LEVEL)
+
 def format_docs_with_metadata(docs):
     """
     Formats the retrieved documents into a string with rich metadata headers.
@@ -8,17 +16,69 @@ def format_docs_with_metadata(docs):
     Returns:
         String of formatted documents.
     """
-    formatted = []
-    for d in docs:
-        meta = d.metadata
-        # Format text with Metadata Header so LLM is context-aware
-        # Using the keys from the User's provided schema: title, publish_date, theme, tags
-        text = (
-            f"[JUDUL]: {meta.get('title', 'Unknown')}\n"
-            f"[TANGGAL TERBIT]: {meta.get('publish_date', 'Unknown')}\n"
-            f"[KATEGORI]: {meta.get('theme', 'General')} | [TAGS]: {meta.get('tags', [])}\n"
-            f"[ISI KONTEN]:\n{d.page_content}\n"
-            f"--------------------------------------------------"
-        )
-        formatted.append(text)
-    return "\n\n".join(formatted)
+    return "\n\n".join(format_section(d.metadata, d.page_content) for d in docs)
+
+def format_section(meta, content):
+    """One metadata header plus content, the unit format_docs_with_metadata repeats per doc."""
+    # Format text with Metadata Header so LLM is context-aware
+    # Using the keys from the User's provided schema: title, publish_date, theme, tags
+    return (
+        f"[JUDUL]: {meta.get('title', 'Unknown')}\n"
+        f"[TANGGAL TERBIT]: {meta.get('publish_date', 'Unknown')}\n"
+        f"[KATEGORI]: {meta.get('theme', 'General')} | [TAGS]: {meta.get('tags', [])}\n"
+        f"[ISI KONTEN]:\n{content}\n"
+        f"--------------------------------------------------"
+    )
+
+class ThinkFilter:
+    """Incrementally removes <think>...</think> blocks from streamed LLM output.
+
+    Feed chunks as they arrive; text that might be the start of a tag is held
+    back until the next chunk decides it. Leading whitespace is dropped, like
+    the .strip() applied to non-streamed answers.
+    """
+
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self.buffer = ""
+        self.in_think = False
+        self.started = False
+
+    def _held_back(self, text, tag):
+        # Length of the longest suffix of `text` that is a proper prefix of `tag`.
+        for size in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:size]):
+                return size
+        return 0
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        output = []
+        while self.buffer:
+            tag = self.CLOSE if self.in_think else self.OPEN
+            index = self.buffer.find(tag)
+            if index >= 0:
+                if not self.in_think:
+                    output.append(self.buffer[:index])
+                self.buffer = self.buffer[index + len(tag):]
+                self.in_think = not self.in_think
+                continue
+            keep = self._held_back(self.buffer, tag)
+            if not self.in_think:
+                output.append(self.buffer[:len(self.buffer) - keep])
+            self.buffer = self.buffer[len(self.buffer) - keep:]
+            break
+        return self._visible("".join(output))
+
+    def flush(self):
+        rest = "" if self.in_think else self.buffer
+        self.buffer = ""
+        return self._visible(rest)
+
+    def _visible(self, text):
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+        return text
@@ -0,0 +1,334 @@
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+from . import bm25, config, embedding_providers, metadata_index
+from .chunk_store import ChunkStore, ChunkStoreWriter
+
+# Index directory layout (no pickle anywhere):
+#   store.json      format version, row count, dimension, build id, embedding model
+#   index.faiss     FAISS index whose ids are the row numbers
+#   vectors.f32     raw float32 vectors, row-major, memory-mapped by readers
+#   chunks/         columnar chunk text + metadata (see chunk_store.py)
+#   bm25/           keyword inverted index over the same rows (see bm25.py)
+#   metadata/       theme/tag bitmaps and date column for filters (see metadata_index.py)
+# Published indexes keep each build in its own directory next to a CURRENT file
+# naming the live one (see publish_index); an index path without CURRENT holds
+# the files itself.
+STORE_FILE = "store.json"
+CURRENT_FILE = "CURRENT"
+INDEX_FILE = "index.faiss"
+VECTORS_FILE = "vectors.f32"
+CHUNKS_DIR = "chunks"
+BM25_DIR = "bm25"
+METADATA_DIR = "metadata"
+FORMAT_VERSION = 1
+# faiss (and ann.py, which needs it) is imported where it is used, so importing
+# this module for index_exists() or read_store_info() stays cheap.
+
+def resolve_index_path(path=None):
+    """Directory holding the files of the index at `path` (default INDEX_PATH): the
+    build CURRENT names, or `path` itself when it has no CURRENT file."""
+    path = path or config.INDEX_PATH
+    try:
+        with open(os.path.join(path, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return path
+
+def read_store_info(path):
+    path = resolve_index_path(path)
+    store_path = os.path.join(path, STORE_FILE)
+    if not os.path.exists(store_path):
+        if os.path.exists(os.path.join(path, "index.pkl")):
+            raise FileNotFoundError(
+                f"{path} holds an index in the old pickle format. Rebuild it with `python main.py --reindex`."
+            )
+        raise FileNotFoundError(f"No index found at {path}.")
+    with open(store_path, 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    if info.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format {info.get('format_version')} at {path}. Please reindex.")
+    return info
+
+def index_exists(path=None):
+    return os.path.exists(os.path.join(resolve_index_path(path), STORE_FILE))
+
+def check_index_type(index_type=None):
+    """`index_type` (default INDEX_TYPE), or ValueError if ann.py cannot build it.
+    Checked before a build starts, not only once all chunks are embedded."""
+    from . import ann
+    index_type = index_type or config.INDEX_TYPE
+    if index_type not in ann.INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Choose one of: {', '.join(ann.INDEX_TYPES)}.")
+    return index_type
+
+def read_faiss_index(path):
+    """Opens a FAISS index memory-mapped and read-only where the index type allows it."""
+    import faiss
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # Newer FAISS releases can also map flat code arrays instead of copying them.
+    flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+class IndexWriter:
+    """Streams chunks and their vectors into a new index directory.
+
+    Vectors are appended to vectors.f32 as they arrive; the FAISS index (of
+    `index_type`, default INDEX_TYPE) is built from that file on close(), since
+    IVF and PQ indexes must be trained before anything can be added.
+    """
+
+    def __init__(self, path, index_type=None):
+        index_type = check_index_type(index_type)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        self.path = path
+        self.chunks = ChunkStoreWriter(os.path.join(path, CHUNKS_DIR))
+        self.vector_file = open(os.path.join(path, VECTORS_FILE), "wb")
+        self.index_type = index_type
+        self.dim = None
+
+    @property
+    def count(self):
+        return self.chunks.count
+
+    def add(self, chunk_ids, texts, metadatas, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension changed from {self.dim} to {vectors.shape[1]}.")
+        vectors.tofile(self.vector_file)
+        for chunk_id, text, metadata in zip(chunk_ids, texts, metadatas):
+            self.chunks.add(chunk_id, text, metadata)
+
+    def copy_rows(self, store, rows, batch_size=1024):
+        """Carries rows of an existing store over without re-embedding them."""
+        rows = list(rows)
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            self.add(
+                [store.chunks.value("chunk_id", r) for r in batch],
+                [store.chunks.value("text", r) for r in batch],
+                [store.chunks.metadata(r) for r in batch],
+                store.vectors[batch]
+            )
+
+    def abort(self):
+        """Discards a build that turned out to be unnecessary or failed."""
+        self.chunks.close()
+        self.vector_file.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def close(self, **info):
+        self.chunks.close()
+        self.vector_file.close()
+        if self.dim is None:
+            raise ValueError("No documents found to index.")
+        vectors = np.memmap(
+            os.path.join(self.path, VECTORS_FILE),
+            dtype="float32",
+            mode="r",
+            shape=(self.count, self.dim)
+        )
+        import faiss
+        from . import ann
+        print(f"Building {self.index_type} FAISS index over {self.count} vectors...")
+        index, description = ann.build_from_vectors(vectors, self.index_type)
+        faiss.write_index(index, os.path.join(self.path, INDEX_FILE))
+        del vectors
+        print("Building BM25 keyword index...")
+        chunks = ChunkStore(os.path.join(self.path, CHUNKS_DIR), self.count)
+        bm25_info = bm25.build_index(chunks, os.path.join(self.path, BM25_DIR))
+        metadata_index.build_index(chunks, os.path.join(self.path, METADATA_DIR))
+        store_info = {
+            "format_version": FORMAT_VERSION,
+            "count": self.count,
+            "dim": self.dim,
+            "metric": "l2",
+            "index_type": self.index_type,
+            "faiss_factory": description,
+            "bm25_terms": len(bm25_info["terms"]),
+            "build_id": uuid.uuid4().hex,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "embedding_provider": config.EMBEDDING_PROVIDER,
+            "embedding_model": embedding_providers.model_name()
+        }
+        store_info.update(info)
+        with open(os.path.join(self.path, STORE_FILE), 'w', encoding='utf-8') as f:
+            json.dump(store_info, f, indent=2)
+        return store_info
+
+def publish_index(build_path, final_path):
+    """Publishes a finished build as the index at `final_path`.
+
+    Files are never replaced in place: the build moves into its own directory
+    under `final_path` and CURRENT is switched to it atomically. A VectorStore
+    resolves its build directory once, when it is loaded, so a running process
+    keeps reading one consistent build, including files it maps only later,
+    until it loads the index again. The previous build is kept for such
+    processes; older ones are deleted, and a process still on one of those gets
+    FileNotFoundError for files it had not opened yet rather than another
+    build's rows.
+    """
+    info = read_store_info(build_path)
+    name = f"build-{time.strftime('%Y%m%d-%H%M%S')}-{info['build_id'][:8]}"
+    os.makedirs(final_path, exist_ok=True)
+    current_file = os.path.join(final_path, CURRENT_FILE)
+    previous = None
+    if os.path.exists(current_file):
+        previous = os.path.basename(resolve_index_path(final_path))
+    os.rename(build_path, os.path.join(final_path, name))
+    tmp_file = current_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(tmp_file, current_file)
+    if previous is None:
+        # First versioned publish: files of an older unversioned index stay at the
+        # top level for processes still reading them and go with the next publish.
+        return
+    for entry in os.listdir(final_path):
+        if entry in (CURRENT_FILE, name, previous):
+            continue
+        entry_path = os.path.join(final_path, entry)
+        if os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+        else:
+            os.remove(entry_path)
+
+class VectorStore:
+    """Read side of the index: near constant-time open, everything mapped lazily.
+
+    Only store.json is read up front. The FAISS index, the vector file and each
+    chunk column are mapped on first use, from the build directory resolved at
+    open (see publish_index), and returned Documents carry `chunk_id` and `row`
+    in their metadata.
+    """
+
+    def __init__(self, path, embeddings=None):
+        self.path = resolve_index_path(path)
+        self.info = read_store_info(path)
+        self.embeddings = embeddings
+        self.chunks = ChunkStore(os.path.join(path, CHUNKS_DIR), self.info["count"])
+        self.nprobe = config.NPROBE
+        self.ef_search = config.EF_SEARCH
+        self._index = None
+        self._vectors = None
+        self._bm25 = None
+        self._metadata = None
+
+    @classmethod
+    def load(cls, path=None, embeddings=None):
+        return cls(path or config.INDEX_PATH, embeddings)
+
+    def __len__(self):
+        return self.info["count"]
+
+    @property
+    def build_id(self):
+        return self.info["build_id"]
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Query-time accuracy/speed knobs: IVF `nprobe` and HNSW `efSearch`."""
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = read_faiss_index(os.path.join(self.path, INDEX_FILE))
+        return self._index
+
+    @property
+    def vectors(self):
+        """(count, dim) float32 memmap of the stored vectors."""
+        if self._vectors is None:
+            self._vectors = np.memmap(
+                os.path.join(self.path, VECTORS_FILE),
+                dtype="float32",
+                mode="r",
+                shape=(self.info["count"], self.info["dim"])
+            )
+        return self._vectors
+
+    @property
+    def bm25(self):
+        """BM25Index over the same rows, or None for an index built before it existed."""
+        if self._bm25 is None:
+            path = os.path.join(self.path, BM25_DIR)
+            if not bm25.BM25Index.exists(path):
+                return None
+            self._bm25 = bm25.BM25Index(path)
+        return self._bm25
+
+    @property
+    def metadata(self):
+        """MetadataIndex for filtered search, or None for an index built before it existed."""
+        if self._metadata is None:
+            path = os.path.join(self.path, METADATA_DIR)
+            if not metadata_index.MetadataIndex.exists(path):
+                return None
+            self._metadata = metadata_index.MetadataIndex(path)
+        return self._metadata
+
+    def warmup(self):
+        """Opens the FAISS index and maps the vector, BM25 and metadata files now
+        instead of on the first search."""
+        return self.index, self.vectors, self.bm25, self.metadata
+
+    def select(self, theme=None, tags=None, date_from=None, date_to=None):
+        """Selection of rows matching the filters (see MetadataIndex.select), or None if unfiltered."""
+        if not (theme or tags or date_from or date_to):
+            return None
+        if self.metadata is None:
+            raise ValueError("This index has no metadata index; rebuild it with `python main.py --reindex` to filter.")
+        return self.metadata.select(theme=theme, tags=tags, date_from=date_from, date_to=date_to)
+
+    def _search_rows(self, query, rows, k):
+        """Exact search restricted to `rows`; cheaper than FAISS for small selections."""
+        distances = ((self.vectors[rows] - query) ** 2).sum(axis=1)
+        if len(rows) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(distances[top], kind="stable")]
+        return rows[top], distances[top]
+
+    def search_by_vector(self, vector, k=4, selection=None):
+        """Returns (rows, distances) of the k nearest chunks, within `selection` if given."""
+        import faiss
+        from . import ann
+        query = np.asarray([vector], dtype="float32")
+        selector = None
+        if selection is not None:
+            if len(selection) == 0:
+                return np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32")
+            if len(selection) <= config.FILTER_BRUTE_FORCE_MAX:
+                return self._search_rows(query[0], selection.rows, k)
+            selector = faiss.IDSelectorBitmap(len(self), faiss.swig_ptr(selection.bitmap))
+        params = ann.search_parameters(self.index, self.nprobe, self.ef_search, selector)
+        distances, rows = self.index.search(query, k, params=params)
+        keep = rows[0] >= 0
+        return rows[0][keep], distances[0][keep]
+
+    def similarity_search_with_score_by_vector(self, vector, k=4):
+        rows, distances = self.search_by_vector(vector, k)
+        return [(self.chunks.document(int(r)), float(d)) for r, d in zip(rows, distances)]
+
+    def similarity_search_by_vector(self, vector, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(vector, k)]
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k)
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]